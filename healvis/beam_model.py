@@ -261,9 +261,11 @@ class PowerBeam(UVBeam):
             za : float or ndarray, zenith angle [radian], must have len(az)
             freqs : float or ndarray, frequencies [Hz]
             pol : str, requested visibility polarization, Ex: 'XX' or 'pI'.
+                Or a list of polarizations, which are interpolated together.
 
         Returns:
-            beam_value : ndarray of beam power, with shape (Npix, Nfreqs) where Npix = len(za)
+            beam_value : ndarray of beam power, with shape (Npix, Nfreqs) where Npix = len(za),
+                or (Npols, Npix, Nfreqs) if pol is a list.
         """
         # type checks
         assert (
@@ -297,7 +299,10 @@ class PowerBeam(UVBeam):
             nearest_inds = np.argmin(freq_dists, axis=1)
             freqs = self.freq_array[0, nearest_inds]
 
-        assert isinstance(pol, str), "requested polarization must be a single string"
+        pols = [pol] if isinstance(pol, str) else list(pol)
+        assert all(
+            isinstance(p, str) for p in pols
+        ), "requested polarizations must be strings"
 
         # interpolate
         if self.pixel_coordinate_system == "az_za":
@@ -307,16 +312,20 @@ class PowerBeam(UVBeam):
                 za_array=za,
                 freq_array=freqs,
                 reuse_spline=True,
-                polarizations=[pol],
+                polarizations=pols,
             )
 
         elif self.pixel_coordinate_system == "healpix":
             # healpix interpolation
             interp_beam, interp_basis, interp_bandpass = self._interp_healpix_bilinear(
-                az_array=az, za_array=za, freq_array=freqs, polarizations=[pol]
+                az_array=az, za_array=za, freq_array=freqs, polarizations=pols
             )
 
-        return interp_beam[0, 0, 0].T
+        # Shape (Npols, Npix, Nfreqs)
+        beam_value = np.swapaxes(interp_beam[0, 0], 1, 2)
+        if isinstance(pol, str):
+            return beam_value[0]
+        return beam_value
 
 
 class AnalyticBeam(object):
@@ -377,7 +386,7 @@ class AnalyticBeam(object):
                 raise KeyError("Dish diameter required for airy beam")
             self.diameter = diameter
 
-    def beam_val(self, az, za, freqs, **kwargs):
+    def beam_val(self, az, za, freqs, out=None, **kwargs):
         """
         Evaluation of an analytic beam model.
 
@@ -385,6 +394,7 @@ class AnalyticBeam(object):
             az : float or ndarray, azimuth angle [radian], must have len(za)
             za : float or ndarray, zenith angle [radian], must have len(az)
             freqs : float or ndarray, frequencies [Hz]
+            out : ndarray, optional array of shape (Npix, Nfreqs) to write the result into
             kwargs : keyword arguments to pass if self.beam_type is callable
 
         Returns:
@@ -400,6 +410,14 @@ class AnalyticBeam(object):
         za = np.asarray(za)
         freqs = np.asarray(freqs)
 
+        if out is not None and self.beam_type == "uniform":
+            out[()] = 1.0
+            return out
+        if out is not None and self.beam_type == "gaussian":
+            sigmas = self.gauss_width * (freqs / self.ref_freq) ** (self.spectral_index)
+            np.divide.outer(-(za ** 2), 2 * sigmas ** 2, out=out)
+            return np.exp(out, out=out)
+
         if self.beam_type == "uniform":
             if isinstance(az, np.ndarray):
                 if np.isscalar(freqs):
@@ -417,4 +435,7 @@ class AnalyticBeam(object):
         elif callable(self.beam_type):
             beam_value = self.beam_type(za, freqs, **kwargs)
 
+        if out is not None:
+            out[()] = beam_value
+            return out
         return beam_value
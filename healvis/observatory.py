@@ -17,7 +17,15 @@ from astropy.coordinates import Angle, AltAz, EarthLocation, ICRS
 from astropy import units
 
 from .beam_model import PowerBeam, AnalyticBeam
-from .utils import jy2Tsr, mparray
+from .utils import (
+    jy2Tsr,
+    mparray,
+    NUFFTPlan,
+    pixel_runs,
+    ring_disc_pixels,
+    ring_table,
+    ringroll_cadence,
+)
 from .cosmology import c_ms
 
 # -----------------------
@@ -25,15 +33,113 @@ from .cosmology import c_ms
 # -----------------------
 
 
+def _uniform_step(freqs, rtol=1e-9):
+    """
+    Return the channel spacing of a frequency array, or None if it is not uniformly spaced.
+    """
+    freqs = np.asarray(freqs, dtype=float)
+    if freqs.size < 2:
+        return 0.0
+    step = (freqs[-1] - freqs[0]) / (freqs.size - 1)
+    if not np.allclose(np.diff(freqs), step, rtol=rtol, atol=0):
+        return None
+    return step
+
+
+def _kaiser_sinc(accuracy):
+    """
+    Half-width in samples and shape of a Kaiser-windowed sinc interpolator.
+
+    The window follows the Kaiser filter design formulas for a stopband attenuation
+    of the accuracy, with the transition band from a quarter to three quarters of the
+    sample rate. Signals sampled at twice their Nyquist rate are then reproduced to
+    the accuracy.
+    """
+    atten = -20 * np.log10(accuracy)
+    if atten > 50:
+        beta = 0.1102 * (atten - 8.7)
+    elif atten > 21:
+        beta = 0.5842 * (atten - 21) ** 0.4 + 0.07886 * (atten - 21)
+    else:
+        beta = 0.0
+    width = int(np.ceil((atten - 7.95) / (2.285 * np.pi) / 2)) + 1
+    return width, beta
+
+
+def _bandlimited_weights(x, Nsamples, accuracy):
+    """
+    Weights of Kaiser-windowed sinc interpolation between uniform samples.
+
+    Args:
+        x : ndarray, positions at which to interpolate, in units of the sample spacing
+        Nsamples : int, number of samples, at positions 0 ... Nsamples - 1
+        accuracy : float, relative accuracy. See _kaiser_sinc.
+
+    Returns:
+        weights : ndarray, shape (x.size, Nsamples)
+    """
+    width, beta = _kaiser_sinc(accuracy)
+    dx = np.asarray(x, dtype=float)[:, np.newaxis] - np.arange(Nsamples)
+    window = np.i0(beta * np.sqrt(np.clip(1 - (dx / width) ** 2, 0, None))) / np.i0(beta)
+    return np.where(np.abs(dx) < width, np.sinc(dx) * window, 0.0)
+
+
+def _band_coordinate(freqs):
+    """
+    Frequencies mapped linearly onto [-1, 1], for Chebyshev expansions across the band.
+    """
+    freqs = np.asarray(freqs, dtype=float)
+    span = freqs.max() - freqs.min()
+    if span == 0:
+        return np.zeros_like(freqs)
+    return (2 * freqs - freqs.max() - freqs.min()) / span
+
+
+def _phasor_recurrence(phase0, dphase, Nfreqs, anchor_every=32):
+    """
+    Evaluate exp(i * (phase0 + k * dphase)) for channels k = 0 ... Nfreqs - 1.
+
+    Each channel is the previous one times the per-channel step, so only the anchor
+    channels need cos/sin. The phasor is evaluated exactly every anchor_every channels
+    to keep the accumulated rounding error bounded.
+
+    Args:
+        phase0 : ndarray, phase at the first channel [radians]
+        dphase : ndarray, phase step per channel [radians], same shape as phase0
+        Nfreqs : int, number of channels
+        anchor_every : int, number of channels between exact evaluations
+
+    Returns:
+        phasor : ndarray of complex, shape (Nfreqs,) + phase0.shape
+    """
+    phasor = np.empty(
+        (Nfreqs,) + np.shape(phase0), dtype=np.result_type(phase0, np.complex64)
+    )
+    step = np.cos(dphase) + (1j) * np.sin(dphase)
+    for k in range(Nfreqs):
+        if k % anchor_every == 0:
+            phs = phase0 + k * dphase
+            phasor[k] = np.cos(phs) + (1j) * np.sin(phs)
+        else:
+            np.multiply(phasor[k - 1], step, out=phasor[k])
+
+    return phasor
+
+
 class Baseline(object):
 
     def __init__(self, ant1_enu=None, ant2_enu=None, ant1=None, ant2=None, enu_vec=None):
         if enu_vec is not None:
             self.enu = enu_vec
+            self.ant1_enu = None
+            self.ant2_enu = None
         else:
             ant1_enu = np.asarray(ant1_enu)
             ant2_enu = np.asarray(ant2_enu)
             self.enu = ant2_enu - ant1_enu
+            # Antenna positions are kept for the antenna-based engine.
+            self.ant1_enu = ant1_enu
+            self.ant2_enu = ant2_enu
 
         assert self.enu.size == 3, f"Wronge enu vector shape {self.enu.shape}"
 
@@ -46,18 +152,43 @@ class Baseline(object):
     def get_uvw(self, freq_Hz):
         return np.outer(self.enu, 1 / (c_ms / freq_Hz))  # In wavelengths
 
-    def get_fringe(self, az, za, freq_Hz, degrees=False):
+    def get_fringe(self, az, za, freq_Hz, degrees=False, method="direct"):
+        """
+        Evaluate the fringe exp(2 pi i u.l) of this baseline.
+
+        Args:
+            az, za : ndarray, azimuth and zenith angles of the pixels
+            freq_Hz : ndarray, frequencies [Hz]
+            degrees : bool, if True az and za are in degrees, otherwise radians
+            method : str
+                "direct" evaluates cos/sin on every pixel and channel.
+                "recurrence" evaluates the first channel and steps through the others
+                by complex multiplication. Falls back to "direct" if the channels are not
+                uniformly spaced.
+
+        Returns:
+            fringe : ndarray of complex, shape (Npix, Nfreqs)
+        """
         if degrees:
             az *= np.pi / 180
             za *= np.pi / 180
-        freq_Hz = freq_Hz.astype(float)
+        freq_Hz = np.asarray(freq_Hz).astype(float)
 
         pos_l = np.sin(az) * np.sin(za)
         pos_m = np.cos(az) * np.sin(za)
         pos_n = np.cos(za)
         lmn = np.vstack((pos_l, pos_m, pos_n))
+        # Single precision az/za give a single precision fringe.
+        dtype = lmn.dtype if lmn.dtype == np.float32 else np.float64
         self.uvw = self.get_uvw(freq_Hz)
-        udotl = np.einsum("jk,jl->kl", lmn, self.uvw)
+        if method == "recurrence":
+            df = _uniform_step(freq_Hz)
+            if df is not None:
+                phs = 2 * np.pi * np.dot(self.enu, lmn) / c_ms  # Phase per Hz
+                return _phasor_recurrence(
+                    (phs * freq_Hz[0]).astype(dtype), (phs * df).astype(dtype), freq_Hz.size
+                ).T
+        udotl = np.einsum("jk,jl->kl", lmn, self.uvw.astype(dtype))
         fringe = np.cos(2 * np.pi * udotl) + (1j) * np.sin(
             2 * np.pi * udotl
         )  # This is weirdly faster than np.exp
@@ -65,6 +196,98 @@ class Baseline(object):
         return fringe
 
 
+class _LatticePhasors(object):
+    """
+    Fringes of lattice baselines, built from integer powers of two basis phasors.
+
+    Powers of each basis phasor are made by repeated multiplication and cached, and
+    negative powers are complex conjugates, so no trig is needed beyond the basis.
+    """
+
+    def __init__(self, basis, coeffs, on_lattice, az, za, freqs):
+        self.coeffs = coeffs
+        self.on_lattice = on_lattice
+        self.powers = []
+        for vec in basis:
+            phasor = Baseline(enu_vec=vec).get_fringe(az, za, freqs)
+            self.powers.append([np.ones_like(phasor), phasor])
+
+    def _power(self, ai, n):
+        powers = self.powers[ai]
+        while len(powers) <= abs(n):
+            powers.append(powers[-1] * powers[1])
+        if n < 0:
+            return powers[-n].conj()
+        return powers[n]
+
+    def fringe(self, bi):
+        """
+        Fringe of baseline bi, which is coeffs[bi, 0] * basis[0] + coeffs[bi, 1] * basis[1].
+        """
+        n1, n2 = self.coeffs[bi]
+        return self._power(0, n1) * self._power(1, n2)
+
+
+class _Workspace(object):
+    """
+    Scratch buffers for the per-time visibility calculation, reused from one pointing to the next.
+
+    Each buffer is a flat array sized for the largest field of view, and get() returns a
+    contiguous view of its start, so pointings with fewer pixels need no new memory.
+    A buffer is only reallocated if a field of view turns out to be larger.
+
+    Args:
+        Ndisc : int, maximum number of candidate pixels found around a pointing
+        Nfov : int, maximum number of pixels in the field of view
+        Nskies : int, number of skies
+        Nfreqs : int, number of frequencies
+        dtype : real dtype of the calculation
+        Npols : int, number of polarizations
+    """
+
+    def __init__(self, Ndisc, Nfov, Nskies, Nfreqs, dtype=np.float64, Npols=1):
+        real = np.dtype(dtype)
+        cplx = np.result_type(real, np.complex64)
+        self.dtype = real
+        # Capacity and dtype of the buffers, which are allocated on first use.
+        cube = Nfov * Nfreqs
+        self._specs = {
+            "vecs": (3 * Ndisc, real),
+            "sdot": (3 * Ndisc, real),
+            "za_all": (Ndisc, real),
+            "mask": (Ndisc, bool),
+            "za": (Nfov, real),
+            "az": (Nfov, real),
+            "x": (Nfov, real),
+            "y": (Nfov, real),
+            "tau": (Nfov, real),
+            "lmn": (3 * Nfov, real),
+            "beam": (Npols * cube, real),
+            "bl_beam": (Npols * cube, real),
+            "phase": (cube, real),
+            "cos": (cube, real),
+            "fringe": (cube, cplx),
+            "sky": (Nskies * cube, real),
+            "wsky": (Npols * Nskies * cube, real),
+            "bl_sky": (Npols * Nskies * cube, real),
+            "prod": (Npols * Nskies * cube, cplx),
+        }
+        self._buffers = {}
+
+    def get(self, name, shape):
+        """
+        Return a contiguous view of the given shape at the start of buffer name.
+        """
+        capacity, dtype = self._specs[name]
+        size = int(np.prod(shape))
+        buf = self._buffers.get(name)
+        if buf is None or buf.size < size:
+            buf = np.empty(max(size, capacity), dtype=dtype)
+            self._buffers[name] = buf
+            self._specs[name] = (buf.size, dtype)
+        return buf[:size].reshape(shape)
+
+
 class Observatory(object):
     """
     Representation of the observing instrument.
@@ -127,16 +350,18 @@ class Observatory(object):
         if freqs is not None:
             self.Nfreqs = len(freqs)
 
-    def _set_vectors(self):
+    def _set_vectors(self, dtype=float):
         """
         Set the unit vectors to pixel centers for the whole shell, in a shared memory array.
 
-        Sets the attribute _vecs.
+        Sets the attribute _vecs, with the given dtype, and _rings, the ring layout
+        of the shell from ring_table.
         """
         vecs = hp.pix2vec(self.healpix.nside, np.arange(self.healpix.npix))
         vecs = np.array(vecs).T  # Shape (Npix, 3)
-        self._vecs = mparray(vecs.shape, dtype=float)
+        self._vecs = mparray(vecs.shape, dtype=dtype)
         self._vecs[()] = vecs[()]
+        self._rings = ring_table(self.healpix.nside)
 
     def set_pointings(self, time_arr):
         """
@@ -169,7 +394,118 @@ class Observatory(object):
         self.pointing_centers = centers
         self.north_poles = north_poles
 
-    def calc_azza(self, center, north=None, return_inds=False):
+    def _fov_radius(self):
+        """
+        Radius in radians of the pixel selection made by calc_azza.
+        """
+        radius = self.fov * np.pi / 180.0 * 1 / 2.0
+        if self.do_horizon_taper:
+            radius += self.healpix.pixel_resolution.to_value(
+                "rad"
+            )  # Allow parts of pixels to be above the horizon.
+        return radius
+
+    def _max_fov_npix(self):
+        """
+        Upper estimate of the number of pixels selected by calc_azza for any pointing.
+
+        This is the area of the selection in pixels, plus one pixel per pixel width
+        around its edge.
+        """
+        radius = self._fov_radius()
+        npix = self.healpix.npix
+        if radius >= np.pi:
+            return npix
+        res = self.healpix.pixel_resolution.to_value("rad")
+        nfov = npix * (1 - np.cos(radius)) / 2.0 + 2 * np.pi * np.sin(radius) / res
+        return min(npix, int(np.ceil(nfov)))
+
+    def _disc_pixels(self, cvec):
+        """
+        Candidate pixels for the selection of calc_azza around the pointing vector cvec.
+
+        Only the rings of the shell that cross the selection are visited. The result
+        includes every selected pixel and a few just outside, at most five per ring,
+        which calc_azza removes.
+        """
+        return ring_disc_pixels(self.healpix.nside, cvec, self._fov_radius(), table=self._rings)
+
+    def _max_disc_npix(self):
+        """
+        Upper estimate of the number of pixels returned by _disc_pixels.
+        """
+        return min(self.healpix.npix, self._max_fov_npix() + 20 * self.healpix.nside)
+
+    def _workspace(self, Nskies, precision="double", Npols=1, Nfreqs=None):
+        """
+        Make a _Workspace for the current shell and field of view.
+        """
+        return _Workspace(
+            self._max_disc_npix(),
+            self._max_fov_npix(),
+            Nskies,
+            self.Nfreqs if Nfreqs is None else Nfreqs,
+            dtype=np.float32 if precision == "single" else np.float64,
+            Npols=Npols,
+        )
+
+    def _read_pixels(self, shell, pix, out, axis=-2):
+        """
+        Copy the pixels pix of shell, along the given axis, into out.
+
+        The shell is RING-ordered, so the sorted pixels of a field of view are a few
+        runs of consecutive pixels on each ring, which are copied as slices.
+        """
+        index = [slice(None)] * shell.ndim
+        out_index = list(index)
+        offset = 0
+        for start, stop in zip(*pixel_runs(pix)):
+            index[axis] = slice(start, stop)
+            out_index[axis] = slice(offset, offset + stop - start)
+            out[tuple(out_index)] = shell[tuple(index)]
+            offset += stop - start
+
+        return out
+
+    def _pol_beam_val(self, az_arr, za_arr, pols, out):
+        """
+        Evaluate the beam for each polarization into out, of shape (Npols, Npix, Nfreqs).
+
+        A PowerBeam interpolates all the polarizations in one call.
+        """
+        if isinstance(self.beam, PowerBeam):
+            out[()] = self.beam.beam_val(az_arr, za_arr, self.freqs, pol=pols)
+        elif isinstance(self.beam, AnalyticBeam):
+            for pi, pol in enumerate(pols):
+                self.beam.beam_val(az_arr, za_arr, self.freqs, pol=pol, out=out[pi])
+        else:
+            for pi, pol in enumerate(pols):
+                out[pi] = self.beam.beam_val(az_arr, za_arr, self.freqs, pol=pol)
+
+        return out
+
+    def _pointing_frame(self, center, north=None):
+        """
+        Unit vectors to the East, North and zenith of a pointing, in the dtype of the pixel vectors.
+
+        center and north may also be arrays of shape (Npointings, 2), which give vectors
+        of shape (Npointings, 3). See calc_azza for the parameters.
+        """
+        center = np.asarray(center, dtype=float)
+        # ang2vec gives shape (3, Npointings) for arrays.
+        cvec = np.transpose(hp.ang2vec(center[..., 0], center[..., 1], lonlat=True))
+
+        if north is None:
+            north = np.array([0, 90.0])
+        north = np.asarray(north, dtype=float)
+        nvec = np.transpose(hp.ang2vec(north[..., 0], north[..., 1], lonlat=True))
+        colat = np.arccos(np.sum(cvec * nvec, axis=-1))  # Should be close to 90d
+        xvec = np.cross(nvec, cvec) * 1 / np.sin(colat)[..., np.newaxis]
+        yvec = np.cross(cvec, xvec)
+        # Do the geometry in the precision of the pixel vectors.
+        return [v.astype(self._vecs.dtype) for v in (xvec, yvec, cvec)]
+
+    def calc_azza(self, center, north=None, return_inds=False, workspace=None):
         """
         Calculate azimuth/altitude of sources given the pointing center.
 
@@ -187,6 +523,9 @@ class Observatory(object):
             azimuth angles returned. Providing the north position fixes this.
         return_inds: bool
             Return the healpix indices (Default False)
+        workspace: _Workspace
+            If given, the angles are written into its buffers, and the returned
+            arrays are views that are overwritten by the next call.
 
         Returns
         -------
@@ -203,32 +542,49 @@ class Observatory(object):
         if self.healpix is None:
             raise AttributeError("Need to set HEALPix instance attribute")
 
-        radius = self.fov * np.pi / 180.0 * 1 / 2.0
-        if self.do_horizon_taper:
-            radius += self.healpix.pixel_resolution.to_value(
-                "rad"
-            )  # Allow parts of pixels to be above the horizon.
-
-        cvec = hp.ang2vec(center[0], center[1], lonlat=True)
-
-        if north is None:
-            north = np.array([0, 90.0])
-        nvec = hp.ang2vec(north[0], north[1], lonlat=True)
-        colat = np.arccos(np.dot(cvec, nvec))  # Should be close to 90d
-        xvec = np.cross(nvec, cvec) * 1 / np.sin(colat)
-        yvec = np.cross(cvec, xvec)
-        sdotx = np.tensordot(self._vecs, xvec, 1)
-        sdotz = np.tensordot(self._vecs, cvec, 1)
-        sdoty = np.tensordot(self._vecs, yvec, 1)
+        radius = self._fov_radius()
+        xvec, yvec, cvec = self._pointing_frame(center, north)
+        if workspace is not None:
+            return self._calc_azza_workspace(xvec, yvec, cvec, radius, return_inds, workspace)
+        disc = self._disc_pixels(cvec)  # Pixels near the field of view
+        vecs = self._vecs[disc]
+        sdotx = np.tensordot(vecs, xvec, 1)
+        sdotz = np.tensordot(vecs, cvec, 1)
+        sdoty = np.tensordot(vecs, yvec, 1)
         za_arr = np.arccos(sdotz)
         az_arr = (np.arctan2(sdotx, sdoty)) % (
             2 * np.pi
         )  # xy plane is tangent. Increasing azimuthal angle eastward, zero at North (y axis). x is East.
         pix = za_arr <= radius  # Horizon cut.
         if return_inds:
-            return za_arr[pix], az_arr[pix], np.arange(self.healpix.npix)[pix]
+            return za_arr[pix], az_arr[pix], disc[pix]
         return za_arr[pix], az_arr[pix]
 
+    def _calc_azza_workspace(self, xvec, yvec, cvec, radius, return_inds, workspace):
+        """
+        The part of calc_azza after the pointing frame is set, writing into a workspace.
+
+        The zenith angle is found on the candidate pixels from _disc_pixels, and
+        azimuths for the selected pixels only.
+        """
+        ws = workspace
+        disc = self._disc_pixels(cvec)
+        Ndisc = disc.size
+        vecs = np.take(self._vecs, disc, axis=0, out=ws.get("vecs", (Ndisc, 3)))
+        sdot = np.dot(vecs, np.array([xvec, yvec, cvec]).T, out=ws.get("sdot", (Ndisc, 3)))
+        za_all = np.arccos(sdot[:, 2], out=ws.get("za_all", (Ndisc,)))
+        sel = np.flatnonzero(np.less_equal(za_all, radius, out=ws.get("mask", (Ndisc,))))
+        pix = disc[sel]  # Horizon cut.
+        Npix = pix.size
+        za_arr = np.take(za_all, sel, out=ws.get("za", (Npix,)))
+        sdotx = np.take(sdot[:, 0], sel, out=ws.get("x", (Npix,)))
+        sdoty = np.take(sdot[:, 1], sel, out=ws.get("y", (Npix,)))
+        az_arr = np.arctan2(sdotx, sdoty, out=ws.get("az", (Npix,)))
+        np.mod(az_arr, 2 * np.pi, out=az_arr)
+        if return_inds:
+            return za_arr, az_arr, pix
+        return za_arr, az_arr
+
     def set_fov(self, fov):
         """
         fov = field of view in degrees
@@ -309,158 +665,2693 @@ class Observatory(object):
 
         return fracs
 
-    def _vis_calc(self, pcents, tinds, shell, vis_array, Nfin, beam_pol="pI"):
+    def _antenna_positions(self):
         """
-        Function sent to subprocesses. Called by make_visibilities.
+        Find the distinct antennas that make up the baseline array.
 
-        pcents : Pointing centers to evaluate.
-        tinds : Array of indices in the time array (and correspondingly in pointings/north_poles)
-        shell : SkyModel data array
-        vis_array : Output array for placing results.
-        Nfin : Number of finished tasks. A variable shared among subprocesses.
+        Antennas are identified by their ENU position and, if set, their antenna number.
+
+        Returns
+        -------
+        antpos: array of float
+            ENU positions of the antennas in meters, shape (Nants, 3).
+        antnums: list
+            Antenna number for each antenna (None if not set on the baselines).
+        bl_ants: array of int
+            Indices into antpos of the two antennas of each baseline, shape (Nbls, 2).
         """
-        if len(pcents) == 0:
-            return
+        keys, antpos, antnums = {}, [], []
+        bl_ants = np.zeros((len(self.array), 2), dtype=int)
+        for bi, bl in enumerate(self.array):
+            if bl.ant1_enu is None or bl.ant2_enu is None:
+                raise ValueError(
+                    "The antenna engine requires baselines made from antenna positions."
+                )
+            for ai, (num, pos) in enumerate(
+                [(bl.ant1, bl.ant1_enu), (bl.ant2, bl.ant2_enu)]
+            ):
+                key = (num,) + tuple(np.round(pos, 6))
+                if key not in keys:
+                    keys[key] = len(antpos)
+                    antpos.append(pos)
+                    antnums.append(num)
+                bl_ants[bi, ai] = keys[key]
+
+        return np.array(antpos, dtype=float), antnums, bl_ants
+
+    def _lattice_basis(self, tol=1e-3):
+        """
+        Find two lattice vectors of which the baselines are integer combinations.
 
-        # Check for North Pole attribute.
-        haspoles = True
-        if self.north_poles is None:
-            warnings.warn("North pole positions not set. Azimuths may be inaccurate.")
-            haspoles = False
+        The shortest baseline and the shortest one not parallel to it are taken as the
+        basis, which is then refined by a least-squares fit to all the lattice baselines.
 
-        for count, c_ in enumerate(pcents):
-            memory_usage_GB = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e6
-            north = self.north_poles[tinds[count]] if haspoles else None
-            za_arr, az_arr, pix = self.calc_azza(c_, north, return_inds=True)
-            if isinstance(self.beam, list):
-                # Adds another dimension to beam_cube: the baselines.
-                # Beams may be different for each antenna, and they are
-                # not power beams.
-                # Multiplies the beams for the 2 antennas in a baseline.
-
-                # Accumulate the antenna numbers
-                antennas = set()
-                for bi, baseline in enumerate(self.array):
-                    assert baseline.ant1 is not None and baseline.ant2 is not None,  \
-                            "Antenna number not set for baseline "+str(bi)
-                    antennas.add(baseline.ant1)
-                    antennas.add(baseline.ant2)
-                assert len(antennas) == len(self.beam), "Number of beams does not match number of antennas"
-
-                beam_cube = [ None for i in range(len(self.array)) ]
-                beam_val = [ None for i in range(len(antennas)) ]
-                for i in antennas:
-                    bv = self.external_beam_val(self.beam[i], az_arr, za_arr, self.freqs, pol=beam_pol)
-                    bv[np.argwhere(za_arr>np.pi/2)[:, 0], :] = 0    # Sources below horizon
-                    beam_val[i] = bv
-                for bi, bl in enumerate(self.array):
-                    # Multiply beam correction for the two antennas in each baseline
-                    beam_cube[bi] = beam_val[bl.ant1]*beam_val[bl.ant2]
-            else:
-                beam_cube = self.beam.beam_val(az_arr, za_arr, self.freqs, pol=beam_pol)
-                beam_cube[np.argwhere(za_arr>np.pi/2)[:, 0], :] = 0    # Sources below horizon
+        Parameters
+        ----------
+        tol: float
+            Maximum distance in meters between a baseline and its lattice point.
+
+        Returns
+        -------
+        basis: array of float
+            Lattice vectors, shape (2, 3). None if no lattice was found.
+        coeffs: array of int
+            Integer coefficients of each baseline, shape (Nbls, 2).
+        on_lattice: array of bool
+            Whether each baseline is on the lattice, shape (Nbls,).
+        """
+        enus = np.array([bl.enu for bl in self.array], dtype=float)
+        lengths = np.linalg.norm(enus, axis=1)
+        coeffs = np.zeros((len(enus), 2), dtype=int)
+        on_lattice = lengths <= tol
+
+        basis = []
+        for bi in np.argsort(lengths):
+            if lengths[bi] <= tol:
+                continue
+            if len(basis) == 0:
+                basis.append(enus[bi])
+            elif np.linalg.norm(np.cross(basis[0], enus[bi])) / np.linalg.norm(basis[0]) > tol:
+                basis.append(enus[bi])
+                break
+        if len(basis) < 2:
+            return None, coeffs, on_lattice
+        basis = np.array(basis)
 
-            if self.do_horizon_taper:
-                horizon_taper = self._horizon_taper(za_arr).reshape(1, za_arr.size, 1)
+        coeffs = np.round(np.linalg.lstsq(basis.T, enus.T, rcond=None)[0].T).astype(int)
+        for i in range(2):
+            on_lattice = np.linalg.norm(np.dot(coeffs, basis) - enus, axis=1) <= tol
+            if np.any(coeffs[on_lattice]):
+                basis = np.linalg.lstsq(coeffs[on_lattice], enus[on_lattice], rcond=None)[0]
+
+        return basis, coeffs, on_lattice
+
+    def _antenna_vis(
+        self, az_arr, za_arr, sky, antpos, bl_ants, ant_beams=None, fringe="direct"
+    ):
+        """
+        Calculate the visibilities of all baselines at once from per-antenna phasors.
+
+        For each frequency, the antenna phasors A (Nants, Npix) are combined with the
+        sky weights w into the Hermitian matrix conj(A) w A^T, whose entries are the
+        visibilities of every antenna pair, in the manner of an FX correlator.
+
+        Parameters
+        ----------
+        az_arr, za_arr: array of float
+            Azimuth and zenith angles of the pixels, in radians.
+        sky: array of float
+            Sky weights, shape (Nskies, Npix, Nfreqs). Should include the beam
+            if ant_beams is not given.
+        antpos: array of float
+            ENU antenna positions in meters, shape (Nants, 3).
+        bl_ants: array of int
+            Antenna indices of each baseline, shape (Nbls, 2).
+        ant_beams: array of float
+            Optional antenna beams, shape (Nants, Npix, Nfreqs). Each baseline is
+            weighted by the product of the beams of its two antennas.
+        fringe: str
+            With "recurrence" the antenna phasors are stepped from channel to channel
+            by complex multiplication, otherwise they are evaluated directly.
+
+        Returns
+        -------
+        vis: array of complex
+            Visibilities, shape (Nbls, Nskies, Nfreqs)
+        """
+        lmn = np.vstack(
+            (np.sin(az_arr) * np.sin(za_arr), np.cos(az_arr) * np.sin(za_arr), np.cos(za_arr))
+        )
+        tau = np.dot(antpos, lmn) / c_ms  # Geometric delays, shape (Nants, Npix)
+        Nskies = sky.shape[0]
+        vis = np.zeros((len(bl_ants), Nskies, self.Nfreqs), dtype=complex)
+        df = _uniform_step(self.freqs) if fringe == "recurrence" else None
+        step = None
+        if df is not None:
+            dphs = 2 * np.pi * df * tau
+            step = np.cos(dphs) + (1j) * np.sin(dphs)
+        phasor = None
+        for fi, freq in enumerate(self.freqs):
+            if step is not None and fi % 32 != 0:
+                # Recurrence from the previous channel, re-anchored every 32 channels.
+                phasor *= step
             else:
-                horizon_taper = 1.0
-            if isinstance(self.beam, list):
-                # Beams are possibly different for each baseline
-                sky = shell[..., pix, :] * horizon_taper 
-                for bi, bl in enumerate(self.array):
-                    fringe_cube = bl.get_fringe(az_arr, za_arr, self.freqs)
-                    vis = np.sum(sky * fringe_cube * beam_cube[bi], axis=-2)
-                    vis_array.put((tinds[count], bi, vis.tolist()))
+                phs = 2 * np.pi * freq * tau
+                phasor = np.cos(phs) + (1j) * np.sin(phs)
+            ant_phasor = phasor
+            if ant_beams is not None:
+                ant_phasor = phasor * ant_beams[..., fi]
+            # Correlation matrix of all antenna pairs, shape (Nskies, Nants, Nants)
+            corr = np.matmul(
+                ant_phasor.conj()[np.newaxis, ...] * sky[:, np.newaxis, :, fi],
+                ant_phasor.T,
+            )
+            vis[..., fi] = corr[:, bl_ants[:, 0], bl_ants[:, 1]].T
+
+        return vis
+
+    def _redundant_groups(self, tol):
+        """
+        Group the baselines by ENU vector.
+
+        Parameters
+        ----------
+        tol: float
+            Baselines within this distance in meters of a group's first member join the group.
+
+        Returns
+        -------
+        groups: list of lists of int
+            Indices into the baseline array of the members of each group.
+        """
+        enus = np.array([bl.enu for bl in self.array], dtype=float)
+        groups, group_vecs = [], np.zeros((0, 3))
+        for bi, enu in enumerate(enus):
+            dists = np.linalg.norm(group_vecs - enu, axis=1)
+            if dists.size > 0 and np.min(dists) <= tol:
+                groups[np.argmin(dists)].append(bi)
             else:
-                sky = shell[..., pix, :] * horizon_taper * beam_cube
-                for bi, bl in enumerate(self.array):
-                    fringe_cube = bl.get_fringe(az_arr, za_arr, self.freqs)
-                    vis = np.sum(sky * fringe_cube, axis=-2)
-                    vis_array.put((tinds[count], bi, vis.tolist()))
-            with Nfin.get_lock():
-                Nfin.value += 1
-            if mp.current_process().name == "0" and Nfin.value > 0:
-                dt = time.time() - self.time0
-                sys.stdout.write(
-                    "Finished: {:d}, Elapsed {:.2f}min, Remain {:.3f}hour, MaxRSS {}GB\n".format(
-                        Nfin.value,
-                        dt / 60.0,
-                        (1 / 3600.0)
-                        * (dt / float(Nfin.value))
-                        * (self.Ntimes - Nfin.value),
-                        memory_usage_GB,
-                    )
-                )
-                sys.stdout.flush()
+                groups.append([bi])
+                group_vecs = np.vstack((group_vecs, enu))
 
-    def make_visibilities(self, shell, Nprocs=1, times_jd=None, beam_pol="pI"):
+        return groups
+
+    def _conjugate_baselines(self, tol=1e-6):
         """
-        Make beam cube and fringe cube, multiply and sum.
-        shell (Npix, Nfreq) = healpix shell, as an mparray (multiprocessing shared array)
+        Find autocorrelations, and baselines that are the conjugates of others.
 
-        Takes a shell in Kelvin
-        Returns visibility in Jy
+        The visibility of a baseline whose ENU vector is the negative of another's is the
+        complex conjugate of that baseline's visibility. With per-antenna beams, the two
+        baselines must also be made of the same pair of antennas.
+
+        Parameters
+        ----------
+        tol: float
+            Tolerance in meters for comparing ENU vectors.
+
+        Returns
+        -------
+        autos: array of bool
+            Whether each baseline has a zero ENU vector, shape (Nbls,).
+        conj_of: array of int
+            Index of an earlier baseline of which each baseline is the conjugate,
+            or -1, shape (Nbls,).
+        """
+        enus = np.array([bl.enu for bl in self.array], dtype=float)
+        autos = np.linalg.norm(enus, axis=1) <= tol
+        conj_of = np.full(len(enus), -1, dtype=int)
+        for bi, bl in enumerate(self.array):
+            if autos[bi]:
+                continue
+            matches = np.linalg.norm(enus[:bi] + enus[bi], axis=1) <= tol
+            for bj in np.where(matches & (conj_of[:bi] < 0))[0]:
+                other = self.array[bj]
+                if not isinstance(self.beam, list) or (
+                    {bl.ant1, bl.ant2} == {other.ant1, other.ant2}
+                ):
+                    conj_of[bi] = bj
+                    break
+
+        return autos, conj_of
+
+    def _baseline_fringe(self, bi, az_arr, za_arr, fringe="direct", lattice=None):
+        """
+        Fringe cube of baseline bi, using the lattice phasors if it is on the lattice.
         """
+        if lattice is not None and lattice.on_lattice[bi]:
+            return lattice.fringe(bi)
+        if fringe == "lattice":
+            fringe = "direct"
+        return self.array[bi].get_fringe(az_arr, za_arr, self.freqs, method=fringe)
 
-        self.healpix = HEALPix(nside=shell.Nside)
-        self._set_vectors()
-        Nfreqs = shell.Nfreqs
+    def _workspace_fringe(self, bl, lmn, workspace):
+        """
+        Evaluate the fringe of one baseline into the buffers of a workspace.
 
-        assert Nfreqs == self.Nfreqs
+        Parameters
+        ----------
+        bl: Baseline
+            The baseline.
+        lmn: array of float
+            Direction cosines of the pixels, shape (3, Npix).
+        workspace: _Workspace
+            Buffers to write into.
 
-        self.time0 = time.time()
-        self.freqs = np.asarray(self.freqs)
-        conv_fact = jy2Tsr(self.freqs, bm=self.healpix.pixel_area.to_value("sr"))
+        Returns
+        -------
+        fringe: array of complex
+            Fringe, shape (Npix, Nfreqs). A view that is overwritten by the next call.
+        """
+        phs = self._workspace_phase(bl, lmn, workspace)
+        fringe = workspace.get("fringe", phs.shape)
+        np.cos(phs, out=fringe.real)
+        np.sin(phs, out=fringe.imag)
 
-        if self.pointing_centers is None and times_jd is None:
-            raise ValueError(
-                "Observatory.pointing_centers must be set using set_pointings() before simulation can begin."
-            )
+        return fringe
 
-        if times_jd is not None:
-            if self.pointing_centers is not None:
-                warnings.warn("Overwriting existing pointing centers")
-            self.set_pointings(times_jd)
+    def _workspace_phase(self, bl, lmn, workspace):
+        """
+        Fringe phase 2 pi f (b.l) / c of one baseline, shape (Npix, Nfreqs), in a workspace buffer.
+        """
+        Npix = lmn.shape[1]
+        tau = np.dot(bl.enu.astype(lmn.dtype), lmn, out=workspace.get("tau", (Npix,)))
+        phs = workspace.get("phase", (Npix, self.Nfreqs))
+        np.multiply.outer(tau, (2 * np.pi * self.freqs / c_ms).astype(lmn.dtype), out=phs)
 
-        self.Ntimes = len(self.pointing_centers)
-        pcenter_list = np.array_split(self.pointing_centers, Nprocs)
-        time_inds = np.array_split(range(self.Ntimes), Nprocs)
-        procs = []
-        man = mp.Manager()
-        vis_array = man.Queue()
-        Nfin = mp.Value("i", 0)
+        return phs
 
-        if Nprocs > 1 and not isinstance(shell.data, mparray):
-            warnings.warn(
-                "Caution: SkyModel data array is not in shared memory. With Nprocs > 1, "
-                "this will cause duplication."
-            )
+    def _real_vis(self, bl, lmn, sky, workspace):
+        """
+        Calculate the visibility of one baseline using only real arithmetic.
 
-        for pi in range(Nprocs):
-            p = mp.Process(
-                name=str(pi),
-                target=self._vis_calc,
-                args=(pcenter_list[pi], time_inds[pi], shell.data, vis_array, Nfin),
-                kwargs={"beam_pol": beam_pol},
-            )
-            p.start()
-            procs.append(p)
-        while (Nfin.value < self.Ntimes) and np.any([p.is_alive() for p in procs]):
-            continue
-        visibilities = []
-        time_inds, baseline_inds = [], []
-        for (ti, bi, varr) in iter(vis_array.get, None):
-            visibilities.append(varr)
-            time_inds += [ti]
-            baseline_inds += [bi]
-            if vis_array.empty():
-                break
+        The real and imaginary parts are the sums over pixels of sky * cos(phase) and
+        sky * sin(phase), so no complex (Npix, Nfreqs) array is made.
 
-        srt = np.lexsort((baseline_inds, time_inds))
-        time_inds = np.array(time_inds)[srt]
-        visibilities = np.array(visibilities)[srt]  # Shape (Nblts, Nskies, Nfreqs)
-        time_array = self.times_jd[time_inds] if self.times_jd is not None else None
-        baseline_array = np.array(baseline_inds)[srt]
+        Parameters
+        ----------
+        bl: Baseline
+            The baseline.
+        lmn: array of float
+            Direction cosines of the pixels, shape (3, Npix).
+        sky: array of float
+            Sky weights including the beam, shape (Nskies, Npix, Nfreqs).
+        workspace: _Workspace
+            Buffers for the phase and its cosine.
 
-        # Time and baseline arrays are now Nblts
-        return visibilities / conv_fact, time_array, baseline_array
+        Returns
+        -------
+        vis: array of complex
+            Visibility, shape (Nskies, Nfreqs)
+        """
+        phs = self._workspace_phase(bl, lmn, workspace)
+        cos_phs = np.cos(phs, out=workspace.get("cos", phs.shape))
+        np.sin(phs, out=phs)
+        # Accumulate in double precision
+        vis = np.einsum("...pf,pf->...f", sky, cos_phs, dtype=np.float64) + (
+            1j
+        ) * np.einsum("...pf,pf->...f", sky, phs, dtype=np.float64)
+
+        return vis
+
+    def _tiled_vis(self, bl, lmn, sky, workspace, pixel_block, engine="direct"):
+        """
+        Calculate the visibility of one baseline in blocks of pixels.
+
+        The phase, fringe and product with the sky of each block are formed and summed
+        into the visibility before moving to the next block, so they stay in cache
+        instead of making full (Npix, Nfreqs) passes through memory.
+
+        Parameters
+        ----------
+        bl: Baseline
+            The baseline.
+        lmn: array of float
+            Direction cosines of the pixels, shape (3, Npix).
+        sky: array of float
+            Sky weights including the beam, shape (Nskies, Npix, Nfreqs).
+        workspace: _Workspace
+            Buffers for one block.
+        pixel_block: int
+            Number of pixels per block.
+        engine: str
+            "direct" or "real". See make_visibilities.
+
+        Returns
+        -------
+        vis: array of complex
+            Visibility, shape (Nskies, Nfreqs)
+        """
+        vis = np.zeros(sky.shape[:-2] + (self.Nfreqs,), dtype=complex)
+        for p0 in range(0, lmn.shape[1], pixel_block):
+            tile = slice(p0, p0 + pixel_block)
+            tile_sky = sky[..., tile, :]
+            if engine == "real":
+                vis += self._real_vis(bl, lmn[:, tile], tile_sky, workspace)
+            else:
+                fringe_tile = self._workspace_fringe(bl, lmn[:, tile], workspace)
+                prod = np.multiply(tile_sky, fringe_tile, out=workspace.get("prod", tile_sky.shape))
+                vis += np.sum(prod, axis=-2, dtype=np.complex128)
+
+        return vis
+
+    def _pixel_block_size(
+        self, Nskies, precision="double", Npols=1, Nfreqs=None, cache_bytes=2 ** 20
+    ):
+        """
+        Number of pixels per block whose fringe and sky products fit in cache_bytes.
+
+        At least 256 pixels, so the loop over blocks stays cheap with many channels.
+        """
+        itemsize = 4 if precision == "single" else 8
+        if Nfreqs is None:
+            Nfreqs = self.Nfreqs
+        # Phase, cosine, complex fringe, and the sky and complex product of every sky.
+        per_pixel = itemsize * Nfreqs * (4 + 3 * Npols * Nskies)
+        return max(256, int(cache_bytes // per_pixel))
+
+    def _gemm_vis(self, az_arr, za_arr, sky, fringe="direct", chunk_bytes=2 ** 28):
+        """
+        Calculate the visibilities of all baselines by a batched matrix product.
+
+        For each frequency, the sky weights (Nskies, Npix) are multiplied into the
+        fringe matrix (Npix, Nbls). The real and imaginary parts are done as two real
+        matrix products. Baselines are processed in chunks to limit the size of the
+        fringe matrices.
+
+        Parameters
+        ----------
+        az_arr, za_arr: array of float
+            Azimuth and zenith angles of the pixels, in radians.
+        sky: array of float
+            Frequency-major sky weights, including the beam, shape (Nfreqs, Nskies, Npix).
+        fringe: str
+            "direct" or "recurrence". See Baseline.get_fringe.
+        chunk_bytes: int
+            Approximate size in bytes of the fringe matrices for each chunk of baselines.
+
+        Returns
+        -------
+        vis: array of complex
+            Visibilities, shape (Nfreqs, Nskies, Nbls)
+        """
+        lmn = np.vstack(
+            (np.sin(az_arr) * np.sin(za_arr), np.cos(az_arr) * np.sin(za_arr), np.cos(za_arr))
+        )
+        enus = np.array([bl.enu for bl in self.array], dtype=float)
+        tau = np.dot(lmn.T, enus.T) / c_ms  # Geometric delays, shape (Npix, Nbls)
+        df = _uniform_step(self.freqs) if fringe == "recurrence" else None
+
+        Nbls = enus.shape[0]
+        vis = np.zeros((self.Nfreqs, sky.shape[1], Nbls), dtype=complex)
+        if za_arr.size == 0:
+            return vis  # Empty field of view.
+        chunk = max(1, int(chunk_bytes // (16 * self.Nfreqs * za_arr.size)))
+        for b0 in range(0, Nbls, chunk):
+            bl_tau = tau[:, b0 : b0 + chunk]
+            if df is not None:
+                phasor = _phasor_recurrence(
+                    2 * np.pi * self.freqs[0] * bl_tau, 2 * np.pi * df * bl_tau, self.Nfreqs
+                )
+                fringe_re, fringe_im = phasor.real, phasor.imag
+            else:
+                phs = 2 * np.pi * self.freqs[:, np.newaxis, np.newaxis] * bl_tau
+                fringe_re, fringe_im = np.cos(phs), np.sin(phs)
+            vis[..., b0 : b0 + chunk] = np.matmul(sky, fringe_re)
+            vis[..., b0 : b0 + chunk] += (1j) * np.matmul(sky, fringe_im)
+
+        return vis
+
+    def _prepare_engine(
+        self,
+        engine="direct",
+        fringe="direct",
+        beam_pol="pI",
+        accuracy=1e-6,
+        nufft_kernel="kaiser_bessel",
+        merge_accuracy=None,
+        cull_accuracy=None,
+    ):
+        """
+        Set up the per-run baseline information used by _vis_time.
+
+        Sets the attributes _autos and _conj_of, _antennas for the "antenna" engine,
+        _lattice for the "lattice" fringe method, _topocentric or _ringroll for
+        the kernel engines, _uvgrid or _delay for the NUFFT engines, _coarse for
+        the "coarse" engine, _merge, the merge accuracy and the longest baseline,
+        for _merge_pixels, and _cull, the cull accuracy, for _cull_pixels. The
+        pointings must be set.
+        """
+        self._autos, self._conj_of = self._conjugate_baselines()
+        self._cull = cull_accuracy
+        self._merge = None
+        if merge_accuracy is not None:
+            length = max([np.linalg.norm(bl.enu) for bl in self.array] + [0.0])
+            self._merge = (merge_accuracy, length)
+        if engine == "antenna":
+            self._antennas = self._antenna_positions()
+        if fringe == "lattice":
+            self._lattice = self._lattice_basis()
+            if self._lattice[0] is None:
+                warnings.warn("No lattice found in the baseline array.")
+            else:
+                print(
+                    "Lattice baselines: {:d} of {:d}".format(
+                        np.sum(self._lattice[2]), len(self.array)
+                    )
+                )
+        if engine == "topocentric":
+            self._topocentric = self._topocentric_kernel(beam_pol, fringe)
+        if engine == "ringroll":
+            self._ringroll = self._ringroll_kernel(beam_pol, fringe)
+        if engine == "uvgrid":
+            self._uvgrid = self._uvgrid_plan(accuracy) + (nufft_kernel,)
+        if engine == "delay":
+            self._delay = (accuracy, nufft_kernel)
+        if engine == "coarse":
+            self._coarse = accuracy
+
+    def _kernel(self, az_arr, za_arr, beam_pol="pI", fringe="direct"):
+        """
+        Beam times fringe of each baseline at fixed pixels, for the kernel engines.
+
+        Parameters
+        ----------
+        az_arr, za_arr: array of float
+            Azimuth and zenith angles of the pixels, in radians.
+        beam_pol, fringe:
+            See make_visibilities.
+
+        Returns
+        -------
+        freqs: array of float
+            Frequencies of the kernel.
+        kernel_re, kernel_im: array of float
+            Real and imaginary parts of the kernel, shape (Nfreqs, Npix, Nuniq * Npols),
+            baseline-major, for the baselines that are not conjugates of others.
+        """
+        pols = [beam_pol] if isinstance(beam_pol, str) else list(beam_pol)
+        Npix = za_arr.size
+        beam_cube = self._pol_beam_val(
+            az_arr, za_arr, pols, np.empty((len(pols), Npix, self.Nfreqs))
+        )
+        beam_cube[:, za_arr > np.pi / 2, :] = 0  # Sources below horizon
+        if self.do_horizon_taper:
+            beam_cube *= self._horizon_taper(za_arr)[:, np.newaxis]
+        lattice = None
+        if fringe == "lattice" and self._lattice[0] is not None:
+            lattice = _LatticePhasors(*self._lattice, az_arr, za_arr, self.freqs)
+
+        uniq = np.flatnonzero(self._conj_of < 0)
+        kernel_re = np.empty((self.Nfreqs, Npix, uniq.size, len(pols)))
+        kernel_im = np.empty_like(kernel_re)
+        for ui, bi in enumerate(uniq):
+            fringe_cube = self._baseline_fringe(bi, az_arr, za_arr, fringe=fringe, lattice=lattice)
+            kern = (fringe_cube[np.newaxis] * beam_cube).transpose(2, 1, 0)
+            kernel_re[:, :, ui] = kern.real
+            kernel_im[:, :, ui] = kern.imag
+
+        # Explicit sizes, since Npix is 0 for an empty field of view.
+        shape = (self.Nfreqs, Npix, uniq.size * len(pols))
+        return self.freqs.copy(), kernel_re.reshape(shape), kernel_im.reshape(shape)
+
+    def _kernel_vis(self, sky, kernel):
+        """
+        Sum a sky sampled at the kernel pixels against the kernel of every baseline.
+
+        Parameters
+        ----------
+        sky: array of float
+            Frequency-major sky at the kernel pixels, shape (Nfreqs, Nskies, Npix).
+        kernel: tuple
+            Output of _kernel. Only the channels in self.freqs are used.
+
+        Returns
+        -------
+        vis: array of complex
+            Visibilities, shape (Nbls, Npols * Nskies, Nfreqs), polarization-major.
+        """
+        freqs, kernel_re, kernel_im = kernel
+        if freqs.size != self.Nfreqs:
+            # A chunk of channels. See _vis_chunked.
+            chans = np.flatnonzero(np.isin(freqs, self.freqs))
+            kernel_re, kernel_im = kernel_re[chans], kernel_im[chans]
+        uniq = np.flatnonzero(self._conj_of < 0)
+        Npols = kernel_re.shape[2] // max(1, uniq.size)
+        if kernel_re.shape[1] == 0:
+            # Empty field of view.
+            vis_uniq = np.zeros((self.Nfreqs, sky.shape[1], kernel_re.shape[2]), dtype=complex)
+        else:
+            vis_uniq = np.matmul(sky, kernel_re) + (1j) * np.matmul(sky, kernel_im)
+
+        # Shape (Nfreqs, Nskies, Nuniq * Npols) to (Nuniq, Npols * Nskies, Nfreqs)
+        vis_uniq = vis_uniq.reshape(self.Nfreqs, sky.shape[1], uniq.size, Npols)
+        vis_uniq = vis_uniq.transpose(2, 3, 1, 0).reshape(uniq.size, -1, self.Nfreqs)
+        vis = np.zeros((len(self.array),) + vis_uniq.shape[1:], dtype=complex)
+        vis[uniq] = vis_uniq
+        conj = np.flatnonzero(self._conj_of >= 0)
+        vis[conj] = vis[self._conj_of[conj]].conj()
+
+        return vis
+
+    def _topocentric_kernel(self, beam_pol="pI", fringe="direct"):
+        """
+        Beam times fringe of each baseline on a fixed grid of ground-based directions.
+
+        The grid is the HEALPix grid of the shell, with its pole at the zenith and its
+        y axis to the North, cut to the field of view. In a drift scan the beam and
+        fringes are fixed on this grid, so they are evaluated once per run.
+
+        Returns
+        -------
+        grid: array of float
+            East, North and up components of the grid directions, shape (Ngrid, 3).
+        kernel: tuple
+            Kernel on the grid, from _kernel.
+        """
+        radius = self._fov_radius()
+        disc = ring_disc_pixels(self.healpix.nside, [0, 0, 1], radius, table=self._rings)
+        grid = np.asarray(self._vecs[disc], dtype=float)
+        grid = grid[grid[:, 2] >= np.cos(radius)]
+        za_arr = np.arccos(grid[:, 2])
+        az_arr = np.arctan2(grid[:, 0], grid[:, 1]) % (2 * np.pi)
+
+        return grid, self._kernel(az_arr, za_arr, beam_pol, fringe)
+
+    def _topocentric_vis(self, center, north, shell):
+        """
+        Calculate the visibilities of all baselines for one pointing from the topocentric kernel.
+
+        The sky is resampled onto the kernel grid by bilinear interpolation between its
+        four nearest pixels, and summed against the kernel by a matrix product per
+        frequency. Requires _prepare_engine to have been run.
+
+        Returns
+        -------
+        vis: array of complex
+            Visibilities, shape (Nbls, Npols * Nskies, Nfreqs), polarization-major.
+        """
+        grid, kernel = self._topocentric
+        frame = np.array(self._pointing_frame(center, north), dtype=float)
+        theta, phi = hp.vec2ang(np.dot(grid, frame))
+        nbrs, weights = hp.get_interp_weights(self.healpix.nside, theta, phi)
+        # Resampled sky, frequency-major, shape (Nfreqs, Nskies, Ngrid)
+        sky = np.einsum("kp,skpf->fsp", weights, shell[:, nbrs, :])
+
+        return self._kernel_vis(sky, kernel)
+
+    def _ringroll_kernel(self, beam_pol="pI", fringe="direct", tol=0.05):
+        """
+        Kernel and ring shifts of the "ringroll" engine.
+
+        The kernel is evaluated on the field of view of the first pointing. Each later
+        pointing is that field of view rotated in right ascension by a whole number of
+        equatorial pixels, 2 pi / (4 Nside), which is checked against the pointing
+        centers to within tol pixels, which absorbs the slow drift of the pointings in
+        right ascension from aberration, precession and nutation. Their small change in
+        declination is ignored.
+
+        Returns
+        -------
+        ra0: float
+            Right ascension of the first pointing, in degrees.
+        pix: array of int
+            Pixels of the first field of view.
+        ring_start, ring_npix, ring_pos: array of int
+            First pixel and number of pixels of the ring of each pixel, and the position
+            of the pixel on its ring.
+        kernel: tuple
+            Kernel on pix, from _kernel.
+        """
+        nside = self.healpix.nside
+        ra = np.array(self.pointing_centers)[:, 0]
+        steps = ((ra - ra[0]) % 360.0) / (360.0 / (4 * nside))
+        shifts = np.round(steps).astype(int)
+        err = np.abs(steps - shifts)
+        if np.any(err > tol):
+            raise ValueError(
+                "The ringroll engine requires pointings a whole number of equatorial "
+                "pixels apart in right ascension, found an offset of {:.3f} pixels. "
+                "Use a time cadence that is a multiple of {:.4f} s.".format(
+                    np.max(err), ringroll_cadence(nside)
+                )
+            )
+        north = self.north_poles[0] if self.north_poles is not None else None
+        za_arr, az_arr, pix = self.calc_azza(self.pointing_centers[0], north, return_inds=True)
+        start, npix = self._rings[:2]
+        rings = np.searchsorted(start, pix, side="right") - 1
+
+        return (
+            ra[0],
+            pix,
+            start[rings],
+            npix[rings],
+            pix - start[rings],
+            self._kernel(az_arr, za_arr, beam_pol, fringe),
+        )
+
+    def _ringroll_vis(self, center, shell):
+        """
+        Calculate the visibilities of all baselines for one pointing by rolling the rings.
+
+        The sky seen by the kernel at this pointing is the first field of view with
+        each ring rolled by the rotation since the first pointing. Equatorial rings roll
+        by whole pixels. Rings in the polar caps have fewer pixels, so their roll is
+        fractional, and the sky is interpolated linearly between the two neighbouring
+        pixels on the ring. Requires _prepare_engine to have been run.
+
+        Returns
+        -------
+        vis: array of complex
+            Visibilities, shape (Nbls, Npols * Nskies, Nfreqs), polarization-major.
+        """
+        ra0, pix, ring_start, ring_npix, ring_pos, kernel = self._ringroll
+        nside = self.healpix.nside
+        shift = np.round(((center[0] - ra0) % 360.0) / (360.0 / (4 * nside)))
+        roll = shift * ring_npix / (4.0 * nside)  # In pixels of each ring
+        lo = np.floor(roll).astype(int)
+        frac = roll - lo
+        lo_pix = ring_start + (ring_pos + lo) % ring_npix
+        sky = shell[:, lo_pix, :]
+        part = np.flatnonzero(frac > 0)
+        if part.size > 0:
+            hi_pix = ring_start[part] + (ring_pos[part] + lo[part] + 1) % ring_npix[part]
+            sky[:, part, :] += frac[part, np.newaxis] * (shell[:, hi_pix, :] - sky[:, part, :])
+
+        return self._kernel_vis(np.ascontiguousarray(sky.transpose(2, 0, 1)), kernel)
+
+    def _mmode_vis(self, shell, beam_pol="pI", fringe="direct", time_chunk=256):
+        """
+        Calculate the visibilities of all pointings from m-mode transfer functions.
+
+        The pointings are the first one rotated in right ascension, so the visibility of a
+        baseline is the circular cross-correlation, along each HEALPix ring, of the sky with
+        the kernel on the first field of view. On each ring this is a product of Fourier
+        coefficients in m, the azimuthal wavenumber. For each frequency, the kernel of each
+        ring is transformed once into transfer functions, and the rings of each sky by an
+        FFT. Their products are summed over rings into one set of m-modes per baseline and
+        sky, which is summed at the rotation angle of every pointing.
+
+        Pointings between the pixels of a ring are Fourier interpolated, which is exact
+        for rotations by whole pixels. The declination of the pointings is taken from the
+        first one. Requires _prepare_engine to have been run.
+
+        Parameters
+        ----------
+        shell: array of float
+            SkyModel data array, shape (Nskies, Npix, Nfreqs).
+        beam_pol, fringe:
+            See make_visibilities.
+        time_chunk: int
+            Number of pointings summed over m at once.
+
+        Returns
+        -------
+        visibilities: array of complex
+            Visibilities, summed over pixels in Kelvin, shape (Nblts, Npols * Nskies, Nfreqs)
+        time_inds, baseline_inds: array of int
+            Time and baseline index of each row of visibilities.
+        """
+        nside = self.healpix.nside
+        centers = np.array(self.pointing_centers)
+        north = self.north_poles[0] if self.north_poles is not None else None
+        za_arr, az_arr, pix = self.calc_azza(centers[0], north, return_inds=True)
+        Nbls, Npols = len(self.array), 1 if isinstance(beam_pol, str) else len(beam_pol)
+        time_inds = np.repeat(np.arange(self.Ntimes), Nbls)
+        baseline_inds = np.tile(np.arange(Nbls), self.Ntimes)
+        if pix.size == 0:
+            # Empty field of view, for every pointing.
+            shape = (self.Ntimes * Nbls, Npols * shell.shape[0], self.Nfreqs)
+            return np.zeros(shape, dtype=complex), time_inds, baseline_inds
+        freqs, kernel_re, kernel_im = self._kernel(az_arr, za_arr, beam_pol, fringe)
+        angles = np.radians(centers[:, 0] - centers[0, 0])  # Rotation of each pointing
+        start, npix = self._rings[:2]
+        rings = np.searchsorted(start, pix, side="right") - 1
+        Nskies, Nkern = shell.shape[0], kernel_re.shape[-1]
+        # m runs from -2 nside to 2 nside.
+        phasors = np.exp(1j * np.outer(angles, np.arange(-2 * nside, 2 * nside + 1)))
+
+        vis = np.zeros((self.Ntimes, Nskies, Nkern, self.Nfreqs), dtype=complex)
+        for fi in range(self.Nfreqs):
+            kernel = kernel_re[fi] + (1j) * kernel_im[fi]  # Shape (Npix, Nkern)
+            modes = np.zeros((4 * nside + 1, Nskies, Nkern), dtype=complex)
+            for ri in np.unique(rings):
+                n = npix[ri]
+                on_ring = rings == ri
+                ring_kernel = np.zeros((n, Nkern), dtype=complex)
+                ring_kernel[pix[on_ring] - start[ri]] = kernel[on_ring]
+                # Transfer functions and sky of the ring, by m.
+                transfer = np.fft.ifft(ring_kernel, axis=0)
+                ring_sky = np.fft.fft(shell[:, start[ri] : start[ri] + n, fi], axis=1)
+                prod = ring_sky.T[:, :, np.newaxis] * transfer[:, np.newaxis, :]
+                m = np.fft.fftfreq(n, 1.0 / n).astype(int)
+                # Split the Nyquist mode between -n/2 and n/2, so rotations between pixels
+                # are interpolated symmetrically.
+                prod[n // 2] /= 2
+                modes[m + 2 * nside] += prod
+                modes[n // 2 + 2 * nside] += prod[n // 2]
+            modes = modes.reshape(modes.shape[0], -1)
+            for t0 in range(0, self.Ntimes, time_chunk):
+                tsel = slice(t0, t0 + time_chunk)
+                vis[tsel, ..., fi] = np.dot(phasors[tsel], modes).reshape(-1, Nskies, Nkern)
+
+        # Shape (Ntimes, Nskies, Nuniq * Npols) to (Ntimes, Nuniq, Npols * Nskies)
+        uniq = np.flatnonzero(self._conj_of < 0)
+        vis = vis.reshape(self.Ntimes, Nskies, uniq.size, Npols, self.Nfreqs)
+        vis = vis.transpose(0, 2, 3, 1, 4).reshape(
+            self.Ntimes, uniq.size, Npols * Nskies, self.Nfreqs
+        )
+        visibilities = np.zeros((self.Ntimes, Nbls) + vis.shape[2:], dtype=complex)
+        visibilities[:, uniq] = vis
+        conj = np.flatnonzero(self._conj_of >= 0)
+        visibilities[:, conj] = visibilities[:, self._conj_of[conj]].conj()
+
+        return visibilities.reshape((-1,) + visibilities.shape[2:]), time_inds, baseline_inds
+
+    def _uvgrid_plan(self, accuracy=1e-6):
+        """
+        Grid parameters of the "uvgrid" engine for a relative accuracy.
+
+        The field of view, |l|, |m| <= X, is gridded by a type-1 NUFFT onto uv cells of
+        1 / (4 X) wavelengths, so its aliases are at least 3 X away, and a Gaussian of
+        width sigma, divided out of the sky beforehand, interpolates the uv grid to each
+        baseline. sigma sets the aliasing error and the interpolation width the truncation
+        error, both to the accuracy. Non-coplanar arrays are gridded the same way in w,
+        on layers of the term n - n_c, which is within h = (1 - cos(radius)) / 2 of zero.
+
+        Returns
+        -------
+        uniq: array of int
+            Baselines evaluated on the grid: not conjugates of others, and not autos.
+        du, sigma: float
+            uv cell size and width of the interpolating Gaussian [wavelengths].
+        dw, sigma_w: float
+            w layer spacing and width of the interpolating Gaussian in w [wavelengths].
+            None if all baselines have the same w.
+        width: int
+            Half-width of the interpolation, in cells or layers.
+        M: int
+            Number of uv cells on each axis.
+        n_c: float
+            n term taken out of the w layers.
+        accuracy: float
+            The requested accuracy.
+        """
+        radius = min(self._fov_radius(), np.pi / 2)
+        X = np.sin(radius)  # Largest |l| or |m| in the field of view
+        h = (1 - np.cos(radius)) / 2
+        n_c = 1 - h
+        ln_eps = np.log(1 / accuracy)
+        du = 1 / (4 * X)
+        sigma = np.sqrt(ln_eps) / (4 * np.pi * X)
+        width = int(np.ceil(1.5 * ln_eps / np.pi)) + 1
+
+        uniq = np.flatnonzero((self._conj_of < 0) & ~self._autos)
+        enu = np.array([self.array[bi].enu for bi in uniq], dtype=float).reshape(-1, 3)
+        fmax = np.max(self.freqs)
+        umax = np.max(np.abs(enu[:, :2]), initial=0) * fmax / c_ms
+        M = 2 * (int(np.ceil(umax / du)) + width + 2)
+
+        w = np.outer(enu[:, 2], [np.min(self.freqs), fmax]) / c_ms
+        wrange = np.ptp(w) if w.size else 0.0
+        dw, sigma_w, Nlayers = None, None, 1
+        if wrange > 0:
+            dw = 1 / (4 * h)
+            sigma_w = np.sqrt(ln_eps) / (4 * np.pi * h)
+            Nlayers = min(int(np.ceil(wrange / dw)) + 2 * width, 2 * width * self.Nfreqs)
+        print(
+            "uv grid: {:d}x{:d} cells of {:.3g} wavelengths, up to {:d} w layers".format(
+                M, M, du, Nlayers
+            )
+        )
+
+        return uniq, du, sigma, dw, sigma_w, width, M, n_c, accuracy
+
+    def _uvgrid_vis(self, az_arr, za_arr, sky):
+        """
+        Calculate the visibilities of all baselines for one pointing on a uv grid.
+
+        For each frequency and w layer, the beam-weighted sky is gridded onto the uv
+        plane by a type-1 NUFFT (utils.NUFFTPlan), and the visibility of each baseline
+        is interpolated from the grid at its (u, v, w) with the Gaussian of _uvgrid_plan.
+        The cost per frequency is one grid per layer plus a fixed number of cells per
+        baseline, so it grows slowly with the number of baselines. Requires
+        _prepare_engine to have been run.
+
+        Parameters
+        ----------
+        az_arr, za_arr: array of float
+            Azimuth and zenith angles of the field of view, in radians.
+        sky: array of float
+            Beam-weighted sky, shape (Npols * Nskies, Npix, Nfreqs).
+
+        Returns
+        -------
+        vis: array of complex
+            Visibilities, shape (Nbls, Npols * Nskies, Nfreqs), polarization-major.
+        """
+        vis = np.zeros((len(self.array), sky.shape[0], self.Nfreqs), dtype=complex)
+        if za_arr.size == 0:
+            # Empty field of view.
+            return vis
+        uniq, du, sigma, dw, sigma_w, width, M, n_c, accuracy, kernel = self._uvgrid
+        sin_za = np.sin(za_arr)
+        lm = np.stack([np.sin(az_arr) * sin_za, np.cos(az_arr) * sin_za], axis=-1)
+        n = np.cos(za_arr) - n_c
+        # Divide out the Fourier transform of the interpolating Gaussians.
+        taper = np.exp(2 * np.pi ** 2 * sigma ** 2 * np.sum(lm ** 2, axis=1))
+        norm = du ** 2 / (2 * np.pi * sigma ** 2)
+        if dw is not None:
+            taper *= np.exp(2 * np.pi ** 2 * sigma_w ** 2 * n ** 2)
+            norm *= dw / (np.sqrt(2 * np.pi) * sigma_w)
+        plan = NUFFTPlan(2 * np.pi * du * lm, M, eps=accuracy / 10, kernel=kernel)
+
+        enu = np.array([self.array[bi].enu for bi in uniq], dtype=float).reshape(-1, 3)
+        offsets = np.arange(-width + 1, width + 1)
+        for fi, freq in enumerate(self.freqs):
+            uvw = enu * freq / c_ms
+            # uv cells around each baseline and their weights, shape (Nuniq, (2 width)^2)
+            cells = np.floor(uvw[:, :2] / du).astype(int)[..., np.newaxis] + offsets
+            gauss = np.exp(-((uvw[:, :2, np.newaxis] - cells * du) ** 2) / (2 * sigma ** 2))
+            cells = (cells[:, 0, :, np.newaxis] + M // 2) * M + cells[:, 1, np.newaxis, :] + M // 2
+            cells = cells.reshape(uniq.size, -1)
+            gauss = (gauss[:, 0, :, np.newaxis] * gauss[:, 1, np.newaxis, :]).reshape(uniq.size, -1)
+            # w layers around each baseline and their weights, shape (Nuniq, Nw)
+            if dw is None:
+                layers = np.zeros((uniq.size, 1), dtype=int)
+                wgauss = np.ones((uniq.size, 1))
+            else:
+                layers = np.floor(uvw[:, 2] / dw).astype(int)[:, np.newaxis] + offsets
+                wgauss = np.exp(-((uvw[:, 2, np.newaxis] - layers * dw) ** 2) / (2 * sigma_w ** 2))
+            used, layers = np.unique(layers, return_inverse=True)
+            layers = layers.reshape(wgauss.shape)
+
+            coeffs = (sky[:, :, fi] * taper).T
+            grids = np.stack([
+                plan.execute(coeffs * np.exp(2j * np.pi * li * (dw or 0) * n)[:, np.newaxis])
+                for li in used
+            ]).reshape(used.size, M * M, -1)
+            grid_vis = 0
+            for wi in range(layers.shape[1]):
+                grid_vis = grid_vis + np.einsum(
+                    "bk,bkc->bc", gauss * wgauss[:, wi, np.newaxis], grids[layers[:, wi, np.newaxis], cells]
+                )
+            phase = np.exp(2j * np.pi * uvw[:, 2] * n_c)
+            vis[uniq, :, fi] = grid_vis * (norm * phase)[:, np.newaxis]
+
+        autos = np.flatnonzero(self._autos & (self._conj_of < 0))
+        vis[autos] = np.sum(sky, axis=1)
+        conj = np.flatnonzero(self._conj_of >= 0)
+        vis[conj] = vis[self._conj_of[conj]].conj()
+
+        return vis
+
+    def _spectral_terms(self, sky, accuracy=1e-6):
+        """
+        Chebyshev expansion in frequency of the spectrum of every pixel.
+
+        The number of terms doubles until the residual summed over pixels is within
+        the accuracy of the total sky.
+
+        Parameters
+        ----------
+        sky: array of float
+            Spectra, shape (Ncols, Npix, Nfreqs).
+        accuracy: float
+            Relative accuracy.
+
+        Returns
+        -------
+        cheb: array of float
+            Chebyshev polynomials at the channels, mapped to [-1, 1], shape (Nfreqs, Nterms).
+        coeffs: array of float
+            Coefficients, shape (Nterms, Ncols, Npix).
+            None if the spectra need more than Nfreqs / 4 terms.
+        """
+        Nfreqs = self.Nfreqs
+        x = _band_coordinate(self.freqs)
+        spectra = sky.reshape(-1, Nfreqs).T
+        total = np.max(np.abs(np.sum(sky, axis=1)))
+        Nterms = 1
+        while True:
+            cheb = np.polynomial.chebyshev.chebvander(x, Nterms - 1)
+            coeffs = np.linalg.lstsq(cheb, spectra, rcond=None)[0]
+            resid = (spectra - np.dot(cheb, coeffs)).reshape(Nfreqs, sky.shape[0], -1)
+            if np.max(np.sum(np.abs(resid), axis=-1)) <= accuracy * total:
+                return cheb, coeffs.reshape(Nterms, sky.shape[0], -1)
+            Nterms *= 2
+            if Nterms > max(1, Nfreqs // 4):
+                return None
+
+    def _delay_vis(self, az_arr, za_arr, sky):
+        """
+        Calculate the visibilities of all baselines for one pointing by a NUFFT along frequency.
+
+        On uniformly spaced channels f_k = f_c + k df, the visibility of a baseline is
+        sum_p a_p(f_k) exp(2 pi i f_k tau_p), with tau_p the delay of pixel p. The
+        spectrum a_p of every pixel is expanded in Chebyshev polynomials of the channel
+        number, with as few terms as reach the accuracy, and each term is then a type-1
+        NUFFT from the pixel delays to the channels (utils.NUFFTPlan), so no
+        (Npix, Nfreqs) fringe is made. Requires _prepare_engine to have been run.
+
+        Parameters
+        ----------
+        az_arr, za_arr: array of float
+            Azimuth and zenith angles of the field of view, in radians.
+        sky: array of float
+            Beam-weighted sky, shape (Npols * Nskies, Npix, Nfreqs).
+
+        Returns
+        -------
+        vis: array of complex
+            Visibilities, shape (Nbls, Npols * Nskies, Nfreqs), polarization-major.
+            None if the spectra need more than Nfreqs / 4 terms.
+        """
+        accuracy, kernel = self._delay
+        Nfreqs = self.Nfreqs
+        if za_arr.size == 0:
+            # Empty field of view.
+            return np.zeros((len(self.array), sky.shape[0], Nfreqs), dtype=complex)
+        df = _uniform_step(self.freqs)
+        terms = self._spectral_terms(sky, accuracy)
+        if terms is None:
+            return None
+        cheb, coeffs = terms
+        coeffs = coeffs.transpose(2, 1, 0)  # Shape (Npix, Npols * Nskies, Nterms)
+
+        sin_za = np.sin(za_arr)
+        lmn = np.array([np.sin(az_arr) * sin_za, np.cos(az_arr) * sin_za, np.cos(za_arr)])
+        f_c = self.freqs[0] + (Nfreqs // 2) * df  # Frequency of mode 0
+        vis = np.zeros((len(self.array), sky.shape[0], Nfreqs), dtype=complex)
+        for bi, bl in enumerate(self.array):
+            if self._conj_of[bi] >= 0:
+                vis[bi] = vis[self._conj_of[bi]].conj()
+                continue
+            if self._autos[bi]:
+                vis[bi] = np.sum(sky, axis=1)
+                continue
+            tau = np.dot(bl.enu, lmn) / c_ms
+            theta = (2 * np.pi * df * tau + np.pi) % (2 * np.pi) - np.pi
+            plan = NUFFTPlan(theta, Nfreqs, eps=accuracy / 10, kernel=kernel)
+            modes = plan.execute(coeffs * np.exp(2j * np.pi * f_c * tau)[:, np.newaxis, np.newaxis])
+            vis[bi] = np.einsum("kcj,kj->ck", modes, cheb)
+
+        return vis
+
+    def _coarse_channels(self, Nterms, oversample=1.5):
+        """
+        Channels on which to evaluate a polynomial of Nterms terms across the band.
+
+        The channels are the nearest to oversample * Nterms Chebyshev nodes of the band,
+        moved apart where nodes near the band edges share a channel. The polynomial is
+        fitted to them by least squares, which stays well conditioned on these nearly
+        Chebyshev points.
+
+        Returns
+        -------
+        chans: array of int
+            Channel indices.
+        interp: array of float
+            Matrix from values on chans to the fitted polynomial at every channel,
+            shape (Nfreqs, chans.size). None if more than half the channels are needed,
+            in which case chans are all the channels.
+        """
+        Nfreqs = self.Nfreqs
+        Nsamples = int(np.ceil(oversample * Nterms))
+        if 2 * Nsamples > Nfreqs:
+            return np.arange(Nfreqs), None
+        x = _band_coordinate(self.freqs)
+        cheb_nodes = np.cos(np.pi * (np.arange(Nsamples)[::-1] + 0.5) / Nsamples)
+        chans = np.argmin(np.abs(x[:, np.newaxis] - cheb_nodes), axis=0)
+        # Make the channels distinct, keeping them within the band.
+        offsets = np.arange(Nsamples)
+        chans = np.maximum.accumulate(chans - offsets) + offsets
+        chans = np.minimum(chans, Nfreqs - Nsamples + offsets)
+        cheb = np.polynomial.chebyshev.chebvander(x, Nterms - 1)
+
+        return chans, np.dot(cheb, np.linalg.pinv(cheb[chans]))
+
+    def _coarse_vis(self, az_arr, za_arr, sky):
+        """
+        Calculate the visibilities of all baselines for one pointing on a subset of the channels.
+
+        The visibility of a baseline is exp(2 pi i f tau_c) R(f), with tau_c the middle
+        of the range of pixel delays in the field of view. With that phase taken out,
+        the delays in R are within half the range, so across the band R is a polynomial
+        of low degree: the Chebyshev terms of the fringe, from the Bessel functions of
+        the half range, plus the terms of the spectra from _spectral_terms. R is evaluated
+        directly on the channels of _coarse_channels, and fitted and interpolated to
+        every channel. Baselines that need more than half the channels are evaluated
+        on all of them. Requires _prepare_engine to have been run.
+
+        Parameters
+        ----------
+        az_arr, za_arr: array of float
+            Azimuth and zenith angles of the field of view, in radians.
+        sky: array of float
+            Beam-weighted sky, shape (Npols * Nskies, Npix, Nfreqs).
+
+        Returns
+        -------
+        vis: array of complex
+            Visibilities, shape (Nbls, Npols * Nskies, Nfreqs), polarization-major.
+            None if the spectra need more than Nfreqs / 4 terms.
+        """
+        from scipy.special import jv
+
+        accuracy = self._coarse
+        Nfreqs = self.Nfreqs
+        terms = self._spectral_terms(sky, accuracy)
+        if terms is None:
+            return None
+        Nspec = terms[0].shape[1]
+        span = np.ptp(self.freqs)
+
+        sin_za = np.sin(za_arr)
+        lmn = np.array([np.sin(az_arr) * sin_za, np.cos(az_arr) * sin_za, np.cos(za_arr)])
+        vis = np.zeros((len(self.array), sky.shape[0], Nfreqs), dtype=complex)
+        nodes = {}  # Channels and interpolation matrix for each number of terms
+        for bi, bl in enumerate(self.array):
+            if self._conj_of[bi] >= 0:
+                vis[bi] = vis[self._conj_of[bi]].conj()
+                continue
+            if self._autos[bi]:
+                vis[bi] = np.sum(sky, axis=1)
+                continue
+            tau = np.dot(bl.enu, lmn) / c_ms
+            tau_c = (tau.max() + tau.min()) / 2
+            # The fringe of R is exp(i omega x) with |omega| <= omega_max, whose
+            # Chebyshev coefficients are 2 i^n J_n(omega).
+            omega_max = np.pi * span * (tau.max() - tau.min()) / 2
+            # J_n(omega) falls off beyond n = omega + O(omega^(1/3)).
+            order = np.arange(int(omega_max + 10 * omega_max ** (1 / 3)) + 64)
+            tail = np.cumsum(2 * np.abs(jv(order, omega_max))[::-1])[::-1]
+            converged = np.flatnonzero(tail <= accuracy / 10)
+            if converged.size == 0:
+                Nnodes = Nfreqs  # Every channel.
+            else:
+                Nnodes = max(1, converged[0]) + Nspec - 1
+            if Nnodes not in nodes:
+                nodes[Nnodes] = self._coarse_channels(Nnodes)
+            chans, interp = nodes[Nnodes]
+            fringe = np.exp(2j * np.pi * np.outer(tau - tau_c, self.freqs[chans]))
+            resid = np.einsum("cpf,pf->cf", sky[:, :, chans], fringe)
+            if interp is not None:
+                resid = np.dot(resid, interp.T)
+            vis[bi] = resid * np.exp(2j * np.pi * self.freqs * tau_c)
+
+        return vis
+
+    def _merge_groups(self, pix, beam_cube):
+        """
+        Multi-order groups of the field of view for _merge_pixels.
+
+        Pixels are grouped by their NESTED parents at the highest order, up to a base
+        pixel, whose pixels all satisfy min(2, 2 pi u r) B <= accuracy <B>. B is the
+        largest beam amplitude of a pixel over polarizations and frequencies, <B> its
+        mean over the field of view, u the longest baseline at the highest frequency
+        and r the side of the parent. Replacing the fringe of a group by its value at
+        one point of the parent changes the fringe by at most min(2, 2 pi u r), so a
+        flat sky changes by at most accuracy times the beam-weighted flux.
+
+        Parameters
+        ----------
+        pix: array of int
+            RING indices of the field of view.
+        beam_cube: array of float
+            Beam of the field of view, shape (Npols, Npix, Nfreqs).
+
+        Returns
+        -------
+        srt: array of int
+            Order of the pixels by NESTED index.
+        starts: array of int
+            Start of each group in the sorted pixels.
+        """
+        if pix.size == 0:
+            # Empty field of view, left unchanged.
+            return np.arange(0), np.arange(0)
+        accuracy, length = self._merge
+        nside = self.healpix.nside
+        nest = hp.ring2nest(nside, pix)
+        srt = np.argsort(nest)
+        nest = nest[srt]
+        beam = np.max(np.abs(beam_cube), axis=(0, 2))[srt]
+        # Largest beam of a group that each order may merge.
+        u = length * np.max(self.freqs) / c_ms
+        side = self.healpix.pixel_resolution.to_value("rad") * 2 ** np.arange(
+            int(np.log2(nside)) + 1
+        )
+        limit = accuracy * np.mean(beam) / np.minimum(2, 2 * np.pi * u * side)
+        order = np.zeros(nest.size, dtype=int)
+        for k in range(1, side.size):
+            parent = nest >> (2 * k)
+            starts = np.flatnonzero(np.r_[True, parent[1:] != parent[:-1]])
+            merge = np.maximum.reduceat(beam, starts) <= limit[k]
+            if not np.any(merge):
+                break
+            # Parents that merge at an order also merge all their children.
+            order[np.repeat(merge, np.diff(np.r_[starts, nest.size]))] = k
+        key = (nest >> (2 * order)) << (2 * order)
+        return srt, np.flatnonzero(np.r_[True, key[1:] != key[:-1]])
+
+    def _merge_pixels(self, pix, az_arr, za_arr, beam_cube, sky):
+        """
+        Merge the pixels of the field of view where the beam is small into multi-order pixels.
+
+        The beam-weighted sky of each group of _merge_groups is summed, and the group is
+        placed at the mean direction of its pixels. Requires _prepare_engine to have been
+        run with merge_accuracy.
+
+        Parameters
+        ----------
+        pix: array of int
+            RING indices of the field of view.
+        az_arr, za_arr: array of float
+            Azimuth and zenith angles of the field of view, in radians.
+        beam_cube: array of float
+            Beam of the field of view, shape (Npols, Npix, Nfreqs).
+        sky: array of float
+            Beam-weighted sky, shape (Npols * Nskies, Npix, Nfreqs).
+
+        Returns
+        -------
+        az_arr, za_arr: array of float
+            Azimuth and zenith angles of the groups.
+        sky: array of float
+            Beam-weighted sky of the groups, shape (Npols * Nskies, Ngroups, Nfreqs).
+        """
+        srt, starts = self._merge_groups(pix, beam_cube)
+        if starts.size == pix.size:
+            return az_arr, za_arr, sky
+        sin_za = np.sin(za_arr[srt])
+        lmn = np.array(
+            [np.sin(az_arr[srt]) * sin_za, np.cos(az_arr[srt]) * sin_za, np.cos(za_arr[srt])]
+        )
+        lmn = np.add.reduceat(lmn, starts, axis=1)
+        lmn /= np.linalg.norm(lmn, axis=0)
+        az_arr = np.arctan2(lmn[0], lmn[1])
+        za_arr = np.arccos(np.clip(lmn[2], -1, 1))
+        return az_arr, za_arr, np.add.reduceat(sky[:, srt], starts, axis=1)
+
+    def _cull_pixels(self, sky):
+        """
+        Pixels of the field of view to keep after dropping the faintest beam-weighted ones.
+
+        Dropping a pixel changes the visibility of any baseline by at most |B S| of the
+        pixel. Each pixel is weighed by its largest |B S| over the frequencies, relative
+        to the zero-spacing visibility |sum B S| of its polarization and sky at the
+        frequency where that is largest. Pixels are dropped from the smallest weight
+        while the dropped weights sum to at most the accuracy, so every visibility
+        changes by at most that fraction of the zero-spacing visibility. The threshold
+        is that of the frequencies of the sky, so it is set per frequency chunk.
+        Requires _prepare_engine to have been run with cull_accuracy.
+
+        Parameters
+        ----------
+        sky: array of float
+            Beam-weighted sky, shape (Npols * Nskies, Npix, Nfreqs).
+
+        Returns
+        -------
+        keep: array of int
+            Sorted indices of the pixels to keep.
+        """
+        if sky.shape[1] == 0:
+            # Empty field of view.
+            return np.arange(0)
+        flux = np.max(np.abs(np.sum(sky, axis=1, dtype=np.float64)), axis=1)
+        amp = np.max(np.abs(sky), axis=2)  # Shape (Ncols, Npix)
+        weight = np.zeros(amp.shape)
+        np.divide(amp, flux[:, np.newaxis], out=weight, where=flux[:, np.newaxis] > 0)
+        weight[(flux[:, np.newaxis] == 0) & (amp > 0)] = np.inf
+        weight = np.max(weight, axis=0)
+        srt = np.argsort(weight)
+        Ndrop = np.searchsorted(np.cumsum(weight[srt]), self._cull, side="right")
+        return np.sort(srt[Ndrop:])
+
+    def _first_fov(self, shell, beam_pol="pI"):
+        """
+        Pixels, beam and beam-weighted sky at the first pointing, as in _vis_time.
+
+        Returns
+        -------
+        pix: array of int
+            RING indices of the field of view.
+        beam_cube: array of float
+            Beam, zero below the horizon, shape (Npols, Npix, Nfreqs).
+        sky: array of float
+            Beam-weighted sky, shape (Npols * Nskies, Npix, Nfreqs).
+        """
+        pols = [beam_pol] if isinstance(beam_pol, str) else list(beam_pol)
+        north = self.north_poles[0] if self.north_poles is not None else None
+        za_arr, az_arr, pix = self.calc_azza(self.pointing_centers[0], north, return_inds=True)
+        beam_cube = self._pol_beam_val(
+            az_arr, za_arr, pols, np.empty((len(pols), pix.size, self.Nfreqs))
+        )
+        beam_cube[:, za_arr > np.pi / 2] = 0
+        sky = self._read_pixels(shell, pix, np.empty((shell.shape[0], pix.size, self.Nfreqs)))
+        if self.do_horizon_taper:
+            sky *= self._horizon_taper(za_arr)[:, np.newaxis]
+        sky = sky[np.newaxis] * beam_cube[:, np.newaxis]
+        # Explicit sizes, since Npix is 0 for an empty field of view.
+        sky = sky.reshape(len(pols) * shell.shape[0], pix.size, self.Nfreqs)
+        return pix, beam_cube, sky
+
+    def _reduction_error(self, shell, attr, beam_pol="pI"):
+        """
+        Effect of a reduction of the field of view at the first pointing.
+
+        The baselines in self.array and a zero-spacing baseline are evaluated with the
+        direct engine with and without the reduction set by the attribute attr, "_cull"
+        or "_merge". Requires _prepare_engine to have been run.
+
+        Returns
+        -------
+        error: float
+            Largest difference, relative to the zero-spacing visibility. 0 if the
+            zero-spacing visibility is 0, as on an empty field of view.
+        """
+        center = self.pointing_centers[0]
+        north = self.north_poles[0] if self.north_poles is not None else None
+        array, opt = self.array, getattr(self, attr)
+        autos, conj_of = self._autos, self._conj_of
+        self.array = list(array) + [Baseline(enu_vec=np.zeros(3))]
+        self._autos, self._conj_of = self._conjugate_baselines()
+        vis = []
+        try:
+            for value in [None, opt]:
+                setattr(self, attr, value)
+                vis.append(self._vis_time(center, north, shell, beam_pol=beam_pol))
+        finally:
+            self.array = array
+            setattr(self, attr, opt)
+            self._autos, self._conj_of = autos, conj_of
+
+        flux = np.max(np.abs(vis[0][-1]))
+        if flux == 0:
+            return 0.0
+        return np.max(np.abs(vis[1] - vis[0])) / flux
+
+    def _vis_time(
+        self,
+        center,
+        north,
+        shell,
+        beam_pol="pI",
+        engine="direct",
+        fringe="direct",
+        precision="double",
+        workspace=None,
+        chunk_bytes=2 ** 28,
+        pixel_block=None,
+    ):
+        """
+        Calculate the visibilities of all baselines for one pointing.
+
+        Requires _prepare_engine to have been run.
+
+        Parameters
+        ----------
+        center: array_like of float
+            [ra, dec] of the pointing center in degrees.
+        north: array_like of float
+            [ra, dec] in degrees of the ICRS North pole, or None.
+        shell: array of float
+            SkyModel data array. Frequency-major, shape (Nfreqs, Nskies, Npix), for the "gemm" engine.
+        beam_pol, engine, fringe, precision:
+            See make_visibilities.
+        workspace: _Workspace
+            Buffers to reuse. A new workspace is made if not given.
+        chunk_bytes: int
+            Size of the fringe matrices of the "gemm" engine. See _gemm_vis.
+        pixel_block: int
+            If set, directly evaluated fringes are summed in blocks of this many pixels.
+            See _tiled_vis.
+
+        Returns
+        -------
+        vis: array of complex
+            Visibilities, shape (Nbls, Npols * Nskies, Nfreqs), polarization-major.
+            Npols is 1 if beam_pol is a string.
+        """
+        real_dtype = np.float32 if precision == "single" else np.float64
+        pols = [beam_pol] if isinstance(beam_pol, str) else list(beam_pol)
+        Npols = len(pols)
+        if workspace is None:
+            workspace = self._workspace(
+                shell.shape[1] if engine == "gemm" else shell.shape[0], precision, Npols
+            )
+        if engine == "topocentric":
+            return self._topocentric_vis(center, north, shell)
+        if engine == "ringroll":
+            return self._ringroll_vis(center, shell)
+        ws = workspace
+        za_arr, az_arr, pix = self.calc_azza(center, north, return_inds=True, workspace=ws)
+        Npix = za_arr.size
+        below = np.flatnonzero(za_arr > np.pi / 2)  # Sources below horizon
+        if isinstance(self.beam, list):
+            # Beams may be different for each antenna, and they are
+            # not power beams. Each baseline is weighted by the product
+            # of the beams of its 2 antennas, which is formed in the loop below.
+
+            # Accumulate the antenna numbers
+            antennas = set()
+            for bi, baseline in enumerate(self.array):
+                assert baseline.ant1 is not None and baseline.ant2 is not None,  \
+                        "Antenna number not set for baseline "+str(bi)
+                antennas.add(baseline.ant1)
+                antennas.add(baseline.ant2)
+            assert len(antennas) == len(self.beam), "Number of beams does not match number of antennas"
+
+            # Beam of each antenna, shape (Npols, Npix, Nfreqs)
+            beam_val = [ None for i in range(len(antennas)) ]
+            for i in antennas:
+                bv = np.array([
+                    self.external_beam_val(self.beam[i], az_arr, za_arr, self.freqs, pol=pol)
+                    for pol in pols
+                ], dtype=real_dtype)
+                bv[:, below, :] = 0
+                beam_val[i] = bv
+        else:
+            beam_cube = self._pol_beam_val(
+                az_arr, za_arr, pols, ws.get("beam", (Npols, Npix, self.Nfreqs))
+            )
+            beam_cube[:, below, :] = 0
+
+        if self.do_horizon_taper:
+            horizon_taper = self._horizon_taper(za_arr).astype(real_dtype)[:, np.newaxis]
+        else:
+            horizon_taper = None
+
+        if engine == "gemm":
+            if horizon_taper is not None:
+                beam_cube *= horizon_taper
+            # Shape (Nfreqs, Npols * Nskies, Npix)
+            fov_shell = np.empty(shell.shape[:-1] + (Npix,), dtype=shell.dtype)
+            fov_shell = self._read_pixels(shell, pix, fov_shell, axis=-1)
+            sky = fov_shell[:, np.newaxis] * beam_cube.transpose(2, 0, 1)[:, :, np.newaxis]
+            sky = sky.reshape(self.Nfreqs, Npols * shell.shape[1], Npix)
+            return self._gemm_vis(
+                az_arr, za_arr, sky, fringe=fringe, chunk_bytes=chunk_bytes
+            ).transpose(2, 1, 0)
+
+        # Gather the field of view of the sky.
+        Nskies = shell.shape[0]
+        sky = self._read_pixels(shell, pix, ws.get("sky", (Nskies, Npix, self.Nfreqs)))
+        if horizon_taper is not None:
+            sky *= horizon_taper
+        wsky_shape = (Npols * Nskies, Npix, self.Nfreqs)
+        if not isinstance(self.beam, list):
+            # Beam-weighted sky of every polarization, polarization-major.
+            wsky = np.multiply(
+                sky[np.newaxis],
+                beam_cube[:, np.newaxis],
+                out=ws.get("wsky", (Npols,) + sky.shape),
+            ).reshape(wsky_shape)
+        if self._cull is not None:
+            keep = self._cull_pixels(wsky)
+            za_arr, az_arr, pix = za_arr[keep], az_arr[keep], pix[keep]
+            beam_cube, wsky = beam_cube[:, keep], wsky[:, keep]
+            Npix = za_arr.size
+        if self._merge is not None:
+            az_arr, za_arr, wsky = self._merge_pixels(pix, az_arr, za_arr, beam_cube, wsky)
+            Npix = za_arr.size
+        if engine == "uvgrid":
+            return self._uvgrid_vis(az_arr, za_arr, wsky)
+        if engine in ["delay", "coarse"]:
+            if engine == "delay":
+                vis = self._delay_vis(az_arr, za_arr, wsky)
+            else:
+                vis = self._coarse_vis(az_arr, za_arr, wsky)
+            if vis is not None:
+                return vis
+            # Spectra that are not smooth are summed directly.
+        if engine == "antenna":
+            antpos, antnums, bl_ants = self._antennas
+            if isinstance(self.beam, list):
+                return np.concatenate([
+                    self._antenna_vis(
+                        az_arr,
+                        za_arr,
+                        sky,
+                        antpos,
+                        bl_ants,
+                        ant_beams=np.array([beam_val[num][pi] for num in antnums]),
+                        fringe=fringe,
+                    )
+                    for pi in range(Npols)
+                ], axis=1)
+            return self._antenna_vis(az_arr, za_arr, wsky, antpos, bl_ants, fringe=fringe)
+
+        lattice = None
+        if fringe == "lattice" and self._lattice[0] is not None:
+            lattice = _LatticePhasors(*self._lattice, az_arr, za_arr, self.freqs)
+        # Direction cosines of the pixels.
+        lmn = ws.get("lmn", (3, Npix))
+        np.sin(za_arr, out=lmn[2])
+        np.multiply(np.sin(az_arr, out=lmn[0]), lmn[2], out=lmn[0])
+        np.multiply(np.cos(az_arr, out=lmn[1]), lmn[2], out=lmn[1])
+        np.cos(za_arr, out=lmn[2])
+
+        vis = np.zeros((len(self.array), Npols * Nskies, self.Nfreqs), dtype=complex)
+        for bi, bl in enumerate(self.array):
+            if self._conj_of[bi] >= 0:
+                vis[bi] = vis[self._conj_of[bi]].conj()
+                continue
+            if isinstance(self.beam, list):
+                # Beams are possibly different for each baseline
+                bl_beam = np.multiply(
+                    beam_val[bl.ant1],
+                    beam_val[bl.ant2],
+                    out=ws.get("bl_beam", (Npols, Npix, self.Nfreqs)),
+                )
+                bl_sky = np.multiply(
+                    sky[np.newaxis],
+                    bl_beam[:, np.newaxis],
+                    out=ws.get("bl_sky", (Npols,) + sky.shape),
+                ).reshape(wsky_shape)
+            else:
+                bl_sky = wsky
+            # Sums over pixels are accumulated in double precision.
+            if self._autos[bi]:
+                vis[bi] = np.sum(bl_sky, axis=-2, dtype=np.float64)
+            elif pixel_block is not None and (
+                engine == "real"
+                or not (fringe == "recurrence" or (lattice is not None and lattice.on_lattice[bi]))
+            ):
+                vis[bi] = self._tiled_vis(bl, lmn, bl_sky, ws, pixel_block, engine=engine)
+            elif engine == "real":
+                vis[bi] = self._real_vis(bl, lmn, bl_sky, ws)
+            else:
+                if fringe == "recurrence" or (lattice is not None and lattice.on_lattice[bi]):
+                    fringe_cube = self._baseline_fringe(
+                        bi, az_arr, za_arr, fringe=fringe, lattice=lattice
+                    )
+                else:
+                    fringe_cube = self._workspace_fringe(bl, lmn, ws)
+                prod = np.multiply(bl_sky, fringe_cube, out=ws.get("prod", bl_sky.shape))
+                vis[bi] = np.sum(prod, axis=-2, dtype=np.complex128)
+
+        return vis
+
+    def _time_block_size(self, Nskies, precision="double", budget=2 ** 28, Npols=1, Nfreqs=None):
+        """
+        Number of pointings per block for _vis_block that fits in a memory budget.
+
+        Parameters
+        ----------
+        Nskies: int
+            Number of skies.
+        precision: str
+            See make_visibilities.
+        budget: int
+            Approximate memory in bytes for the arrays of one block.
+        Npols: int
+            Number of polarizations.
+        Nfreqs: int
+            Number of channels evaluated together. Defaults to all of them.
+        """
+        per_time = self._chunk_bytes(
+            self.Nfreqs if Nfreqs is None else Nfreqs, Nskies, Npols=Npols, precision=precision
+        )
+        return max(1, int(budget // per_time))
+
+    def _vis_block(self, centers, norths, shell, beam_pol="pI", engine="direct", precision="double"):
+        """
+        Calculate the visibilities of all baselines for a block of pointings at once.
+
+        The geometry, beam and fringes are evaluated with a time axis, so the Python
+        overhead is paid once per block. The field of view of each pointing is padded to
+        the size of the largest one with pixels of zero weight. Requires _prepare_engine
+        to have been run.
+
+        Parameters
+        ----------
+        centers: array_like of float
+            [ra, dec] of each pointing center in degrees, shape (Nblock, 2).
+        norths: list
+            [ra, dec] in degrees of the ICRS North pole for each pointing, or None.
+        shell: array of float
+            SkyModel data array, shape (Nskies, Npix, Nfreqs).
+        beam_pol, engine, precision:
+            See make_visibilities. The engine is "direct" or "real".
+
+        Returns
+        -------
+        vis: array of complex
+            Visibilities, shape (Nblock, Nbls, Npols * Nskies, Nfreqs), polarization-major.
+        """
+        real_dtype = np.float32 if precision == "single" else np.float64
+        pols = [beam_pol] if isinstance(beam_pol, str) else list(beam_pol)
+        Nblock = len(centers)
+        radius = self._fov_radius()
+        if norths[0] is None:
+            norths = None
+        frames = np.stack(self._pointing_frame(centers, norths), axis=1)  # (Nblock, 3, 3)
+        # Candidate pixels near the field of view of any pointing in the block.
+        disc = np.unique(np.concatenate([self._disc_pixels(frame[2]) for frame in frames]))
+        sdot = np.dot(self._vecs[disc], frames.reshape(Nblock * 3, 3).T).reshape(
+            disc.size, Nblock, 3
+        )
+        za_all = np.arccos(sdot[..., 2])
+        inside = za_all <= radius  # Horizon cut, per pointing.
+        # Positions in disc of the pixels of each pointing, shape (Nblock, Npix), padded with 0.
+        Npix = np.max(np.sum(inside, axis=0))
+        if Npix == 0:
+            # No pointing of the block sees a pixel.
+            return np.zeros(
+                (Nblock, len(self.array), len(pols) * shell.shape[0], self.Nfreqs), dtype=complex
+            )
+        sel = np.zeros((Nblock, Npix), dtype=int)
+        valid = np.zeros((Nblock, Npix), dtype=bool)
+        for ti in range(Nblock):
+            inds = np.flatnonzero(inside[:, ti])
+            sel[ti, : inds.size] = inds
+            valid[ti, : inds.size] = True
+        tinds = np.arange(Nblock)[:, np.newaxis]
+        pix = disc[sel]
+        za_arr = za_all[sel, tinds]
+        az_arr = np.arctan2(sdot[sel, tinds, 0], sdot[sel, tinds, 1]) % (2 * np.pi)
+
+        # Beam of every polarization and pointing, shape (Npols, Nblock, Npix, Nfreqs)
+        beam_cube = self._pol_beam_val(
+            az_arr.ravel(),
+            za_arr.ravel(),
+            pols,
+            np.empty((len(pols), Nblock * Npix, self.Nfreqs), dtype=real_dtype),
+        ).reshape(len(pols), Nblock, Npix, self.Nfreqs)
+        weights = (valid & (za_arr <= np.pi / 2)).astype(real_dtype)  # Sources below horizon
+        if self.do_horizon_taper:
+            weights *= self._horizon_taper(za_arr)
+        beam_cube *= weights[..., np.newaxis]
+        # Field of view of each pointing, read as runs of consecutive pixels.
+        sky = np.zeros((shell.shape[0], Nblock, Npix, self.Nfreqs), dtype=real_dtype)
+        for ti in range(Nblock):
+            Nvalid = np.count_nonzero(valid[ti])
+            self._read_pixels(shell, pix[ti, :Nvalid], sky[:, ti, :Nvalid])
+        # Beam-weighted sky, shape (Npols * Nskies, Nblock, Npix, Nfreqs)
+        sky = (sky[np.newaxis] * beam_cube[:, np.newaxis]).reshape((-1,) + sky.shape[1:])
+
+        lmn = np.stack(
+            (np.sin(az_arr) * np.sin(za_arr), np.cos(az_arr) * np.sin(za_arr), np.cos(za_arr))
+        )
+        kvec = (2 * np.pi * self.freqs / c_ms).astype(real_dtype)
+        vis = np.zeros((Nblock, len(self.array), sky.shape[0], self.Nfreqs), dtype=complex)
+        phs = np.empty(za_arr.shape + (self.Nfreqs,), dtype=real_dtype)
+        if engine == "real":
+            cos_phs = np.empty_like(phs)
+        else:
+            fringe_cube = np.empty(phs.shape, dtype=np.result_type(real_dtype, np.complex64))
+        for bi, bl in enumerate(self.array):
+            if self._conj_of[bi] >= 0:
+                vis[:, bi] = vis[:, self._conj_of[bi]].conj()
+                continue
+            # Sums over pixels are accumulated in double precision.
+            if self._autos[bi]:
+                vis[:, bi] = np.einsum("stpf->tsf", sky, dtype=np.float64)
+                continue
+            tau = np.tensordot(bl.enu.astype(real_dtype), lmn, 1)
+            np.multiply(tau[..., np.newaxis], kvec, out=phs)
+            if engine == "real":
+                np.cos(phs, out=cos_phs)
+                np.sin(phs, out=phs)
+                vis[:, bi] = np.einsum(
+                    "stpf,tpf->tsf", sky, cos_phs, dtype=np.float64
+                ) + (1j) * np.einsum("stpf,tpf->tsf", sky, phs, dtype=np.float64)
+            else:
+                np.cos(phs, out=fringe_cube.real)
+                np.sin(phs, out=fringe_cube.imag)
+                vis[:, bi] = np.einsum(
+                    "stpf,tpf->tsf", sky, fringe_cube, dtype=np.complex128
+                )
+
+        return vis
+
+    def _chunk_bytes(self, Nfreqs, Nskies, Npols=1, Nblock=1, precision="double"):
+        """
+        Approximate memory in bytes to evaluate a chunk of channels and skies for a block of pointings.
+        """
+        itemsize = 4 if precision == "single" else 8
+        # Full-shell geometry, and the beam, phase, fringe, sky and product cubes of the field of view.
+        return itemsize * Nblock * (
+            5 * self.healpix.npix
+            + self._max_fov_npix() * Nfreqs * (5 + Npols + Nskies * (1 + 3 * Npols))
+        )
+
+    def _chunk_sizes(
+        self, max_memory, Nskies, Npols=1, Nblock=1, engine="direct", precision="double"
+    ):
+        """
+        Split the frequency, sky and baseline axes into chunks that fit a memory budget.
+
+        Channels are split first, since the fringes are computed once per channel
+        whatever the chunk size, and skies only if one channel does not fit. For the
+        "gemm" engine, a quarter of the budget goes to the fringe matrices of each
+        chunk of baselines. The other engines hold one baseline at a time.
+
+        Parameters
+        ----------
+        max_memory: float
+            Memory budget in bytes.
+        Nskies, Npols: int
+            Number of skies and polarizations.
+        Nblock: int
+            Number of pointings evaluated together.
+        engine, precision: str
+            See make_visibilities.
+
+        Returns
+        -------
+        freq_chunk, sky_chunk: int
+            Number of channels and skies per chunk.
+        fringe_bytes: int
+            Memory for the fringe matrices of the "gemm" engine.
+        """
+        fringe_bytes = int(max_memory // 4) if engine == "gemm" else 2 ** 28
+        budget = max_memory - fringe_bytes if engine == "gemm" else max_memory
+
+        def nfit(size, fixed, per_unit):
+            # Equal chunks of at most the number of units that fit.
+            n = int(np.clip((budget - fixed) // per_unit, 1, size))
+            return int(np.ceil(size / np.ceil(size / n)))
+
+        kw = dict(Npols=Npols, Nblock=Nblock, precision=precision)
+        fixed = self._chunk_bytes(0, Nskies, **kw)
+        freq_chunk = nfit(self.Nfreqs, fixed, self._chunk_bytes(1, Nskies, **kw) - fixed)
+        sky_chunk = Nskies
+        if self._chunk_bytes(freq_chunk, sky_chunk, **kw) > budget:
+            fixed = self._chunk_bytes(1, 0, **kw)
+            sky_chunk = nfit(Nskies, fixed, self._chunk_bytes(1, 1, **kw) - fixed)
+        if self._chunk_bytes(freq_chunk, sky_chunk, **kw) > budget:
+            warnings.warn(
+                "Memory budget is less than the {:.3g} GB needed for one channel and "
+                "one sky.".format(self._chunk_bytes(1, 1, **kw) / 1e9)
+            )
+
+        return freq_chunk, sky_chunk, fringe_bytes
+
+    def _vis_chunked(
+        self,
+        centers,
+        norths,
+        shell,
+        chunks,
+        workspace,
+        beam_pol="pI",
+        engine="direct",
+        fringe="direct",
+        precision="double",
+        pixel_block=None,
+    ):
+        """
+        Calculate the visibilities of a block of pointings, one chunk of channels and skies at a time.
+
+        Each chunk is evaluated by _vis_block, or _vis_time for a single pointing,
+        with the frequencies of the observatory set to those of the chunk.
+
+        Parameters
+        ----------
+        centers, norths: list
+            Pointing centers and North pole positions of the block. See _vis_block.
+        shell: array of float
+            SkyModel data array. Frequency-major, shape (Nfreqs, Nskies, Npix), for the "gemm" engine.
+        chunks: tuple of int
+            Number of channels and skies per chunk, and the fringe matrix size for the
+            "gemm" engine, as returned by _chunk_sizes.
+        workspace: _Workspace
+            Buffers for _vis_time.
+        beam_pol, engine, fringe, precision, pixel_block:
+            See make_visibilities.
+
+        Returns
+        -------
+        vis: array of complex
+            Visibilities, shape (Nblock, Nbls, Npols * Nskies, Nfreqs), polarization-major.
+        """
+        freq_chunk, sky_chunk, fringe_bytes = chunks
+        Nskies = shell.shape[1] if engine == "gemm" else shell.shape[0]
+        Npols = 1 if isinstance(beam_pol, str) else len(beam_pol)
+        freqs = self.freqs
+        vis = np.zeros(
+            (len(centers), len(self.array), Npols, Nskies, freqs.size), dtype=complex
+        )
+        for f0 in range(0, freqs.size, freq_chunk):
+            fsel = slice(f0, f0 + freq_chunk)
+            for s0 in range(0, Nskies, sky_chunk):
+                ssel = slice(s0, s0 + sky_chunk)
+                if engine == "gemm":
+                    chunk_shell = shell[fsel, ssel]
+                else:
+                    chunk_shell = shell[ssel, :, fsel]
+                self.freqs = freqs[fsel]
+                self.Nfreqs = self.freqs.size
+                try:
+                    if len(centers) > 1:
+                        chunk_vis = self._vis_block(
+                            centers,
+                            norths,
+                            chunk_shell,
+                            beam_pol=beam_pol,
+                            engine=engine,
+                            precision=precision,
+                        )
+                    else:
+                        chunk_vis = self._vis_time(
+                            centers[0],
+                            norths[0],
+                            chunk_shell,
+                            beam_pol=beam_pol,
+                            engine=engine,
+                            fringe=fringe,
+                            precision=precision,
+                            workspace=workspace,
+                            chunk_bytes=fringe_bytes,
+                            pixel_block=pixel_block,
+                        )[np.newaxis]
+                finally:
+                    self.freqs = freqs
+                    self.Nfreqs = freqs.size
+                vis[..., ssel, fsel] = chunk_vis.reshape(vis.shape[:3] + (-1, self.freqs[fsel].size))
+
+        return vis.reshape(vis.shape[:2] + (Npols * Nskies, freqs.size))
+
+    def _vis_calc(
+        self,
+        pcents,
+        tinds,
+        shell,
+        vis_array,
+        Nfin,
+        beam_pol="pI",
+        engine="direct",
+        fringe="direct",
+        precision="double",
+        time_block=1,
+        chunks=None,
+        pixel_block=None,
+    ):
+        """
+        Function sent to subprocesses. Called by make_visibilities.
+
+        pcents : Pointing centers to evaluate.
+        tinds : Array of indices in the time array (and correspondingly in pointings/north_poles)
+        shell : SkyModel data array. Frequency-major, shape (Nfreqs, Nskies, Npix), for the "gemm" engine.
+        vis_array : Output array for placing results.
+        Nfin : Number of finished tasks. A variable shared among subprocesses.
+        beam_pol, engine, fringe, precision, time_block, pixel_block : See make_visibilities.
+        chunks : (channels, skies, gemm fringe bytes) per chunk, from _chunk_sizes.
+            Defaults to a single chunk.
+        """
+        if len(pcents) == 0:
+            return
+
+        # Check for North Pole attribute.
+        haspoles = True
+        if self.north_poles is None:
+            warnings.warn("North pole positions not set. Azimuths may be inaccurate.")
+            haspoles = False
+
+        Nskies = shell.shape[1] if engine == "gemm" else shell.shape[0]
+        Npols = 1 if isinstance(beam_pol, str) else len(beam_pol)
+        if chunks is None:
+            chunks = (self.Nfreqs, Nskies, 2 ** 28)
+        # Buffers for all the pointings of this worker, sized for one chunk.
+        workspace = self._workspace(
+            min(chunks[1], Nskies), precision, Npols, Nfreqs=min(chunks[0], self.Nfreqs)
+        )
+        Nbls = len(self.array)
+        for b0 in range(0, len(pcents), time_block):
+            memory_usage_GB = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e6
+            block_inds = tinds[b0 : b0 + time_block]
+            norths = [self.north_poles[ti] if haspoles else None for ti in block_inds]
+            vis = self._vis_chunked(
+                pcents[b0 : b0 + time_block],
+                norths,
+                shell,
+                chunks,
+                workspace,
+                beam_pol=beam_pol,
+                engine=engine,
+                fringe=fringe,
+                precision=precision,
+                pixel_block=pixel_block,
+            )
+            # One message per block: time indices, baseline indices and visibilities.
+            vis_array.put(
+                (
+                    np.repeat(block_inds, Nbls),
+                    np.tile(np.arange(Nbls), len(block_inds)),
+                    vis.reshape((-1,) + vis.shape[2:]),
+                )
+            )
+            with Nfin.get_lock():
+                Nfin.value += len(block_inds)
+            if mp.current_process().name == "0" and Nfin.value > 0:
+                dt = time.time() - self.time0
+                sys.stdout.write(
+                    "Finished: {:d}, Elapsed {:.2f}min, Remain {:.3f}hour, MaxRSS {}GB\n".format(
+                        Nfin.value,
+                        dt / 60.0,
+                        (1 / 3600.0)
+                        * (dt / float(Nfin.value))
+                        * (self.Ntimes - Nfin.value),
+                        memory_usage_GB,
+                    )
+                )
+                sys.stdout.flush()
+
+    def _check_engine_options(
+        self, engine, fringe, precision, time_block, pixel_block, max_memory
+    ):
+        """
+        Check the engine, fringe, precision and blocking options of make_visibilities.
+
+        Raises ValueError for unknown or incompatible options.
+        """
+        kernel_engines = ["topocentric", "ringroll", "mmode"]
+        nufft_engines = ["uvgrid", "delay"]
+        fast_engines = ["gemm", "coarse"] + kernel_engines + nufft_engines
+        if engine not in ["direct", "antenna", "real"] + fast_engines:
+            raise ValueError("Unknown visibility engine: {}".format(engine))
+        if engine in fast_engines and isinstance(self.beam, list):
+            raise ValueError(
+                "The {} engine requires the same beam for all antennas.".format(engine)
+            )
+        if fringe not in ["direct", "recurrence", "lattice"]:
+            raise ValueError("Unknown fringe method: {}".format(fringe))
+        if precision not in ["double", "single"]:
+            raise ValueError("Unknown precision: {}".format(precision))
+        if precision == "single" and engine not in ["direct", "real"]:
+            raise ValueError("Single precision requires the direct or real engine.")
+        if time_block != 1:
+            if time_block != "auto" and not (
+                isinstance(time_block, (int, np.integer)) and time_block > 1
+            ):
+                raise ValueError("time_block must be a positive integer or 'auto'.")
+            if engine not in ["direct", "real"] or fringe != "direct":
+                raise ValueError(
+                    "Time blocks require the direct or real engine with direct fringes."
+                )
+            if isinstance(self.beam, list):
+                raise ValueError("Time blocks require the same beam for all antennas.")
+        if max_memory is not None and not max_memory > 0:
+            raise ValueError("max_memory must be a positive number of bytes.")
+        if pixel_block is not None:
+            if pixel_block != "auto" and not (
+                isinstance(pixel_block, (int, np.integer)) and pixel_block > 0
+            ):
+                raise ValueError("pixel_block must be a positive integer or 'auto'.")
+            if engine not in ["direct", "real"] or time_block != 1:
+                raise ValueError(
+                    "Pixel blocks require the direct or real engine with time_block 1."
+                )
+
+    def _check_accuracy_options(self, engine, time_block, times_jd, **accuracies):
+        """
+        Check the accuracy options of make_visibilities against the engine and beam.
+
+        accuracies are the keyword arguments accuracy, nufft_kernel, time_accuracy,
+        sky_accuracy, merge_accuracy and cull_accuracy of make_visibilities. Raises
+        ValueError for values out of range or incompatible options.
+        """
+        for name, value in accuracies.items():
+            if name != "nufft_kernel" and value is not None and not 0 < value < 1:
+                raise ValueError("{} must be between 0 and 1.".format(name))
+        if accuracies["nufft_kernel"] not in ["kaiser_bessel", "gaussian"]:
+            raise ValueError("Unknown NUFFT kernel: {}".format(accuracies["nufft_kernel"]))
+        multi_beam = isinstance(self.beam, list)
+        if accuracies["time_accuracy"] is not None:
+            if engine == "mmode" or multi_beam:
+                raise ValueError(
+                    "Time sampling requires a single beam and an engine other than mmode."
+                )
+            times = self.times_jd if times_jd is None else times_jd
+            # Julian dates are only good to tens of microseconds.
+            if times is None or len(times) < 2 or _uniform_step(times, rtol=1e-3) is None:
+                raise ValueError("Time sampling requires uniformly spaced times.")
+        if accuracies["sky_accuracy"] is not None and (engine == "ringroll" or multi_beam):
+            raise ValueError(
+                "Sky degrading requires a single beam and an engine other than ringroll."
+            )
+        pixel_engines = ["direct", "antenna", "real", "uvgrid", "delay", "coarse"]
+        for name, label in [("merge_accuracy", "Pixel merging"), ("cull_accuracy", "Beam culling")]:
+            if accuracies[name] is not None and (
+                engine not in pixel_engines or multi_beam or time_block != 1
+            ):
+                raise ValueError(
+                    "{} requires a single beam, time_block 1, and the direct, antenna, "
+                    "real, uvgrid, delay or coarse engine.".format(label)
+                )
+
+    def _fallback_engine(self, shell, engine, fringe, accuracy=1e-6):
+        """
+        Engine and fringe method to use for the frequencies and sky of a run.
+
+        Recurrence fringes and the "delay" engine need uniformly spaced channels, and
+        the "coarse" engine smooth spectra. Otherwise the direct method is used, with a
+        warning.
+        """
+        if fringe == "recurrence" and _uniform_step(self.freqs) is None:
+            warnings.warn(
+                "Frequencies are not uniformly spaced. Using direct fringe evaluation."
+            )
+            fringe = "direct"
+        if engine == "delay" and _uniform_step(self.freqs) is None:
+            warnings.warn(
+                "Frequencies are not uniformly spaced. Using the direct engine."
+            )
+            engine = "direct"
+        if engine == "coarse":
+            # Check the spectra of a sample of pixels.
+            step = max(1, shell.Npix // 4096)
+            if self._spectral_terms(shell.data[:, ::step], accuracy) is None:
+                warnings.warn("Sky spectra are not smooth. Using the direct engine.")
+                engine = "direct"
+
+        return engine, fringe
+
+    def _run_engine(
+        self, shell, Nprocs, times_jd, vis_opts, sky_accuracy=None, time_accuracy=None, **kwargs
+    ):
+        """
+        Run the visibility calculation for the sky and time sampling options.
+
+        _run_multires with sky_accuracy, otherwise _run_time_sampled with time_accuracy,
+        otherwise _run_vis_calc. kwargs are passed on to _run_vis_calc.
+
+        Returns
+        -------
+        visibilities: array of complex
+            Unsorted visibilities, shape (Nblts, Npols * Nskies, Nfreqs)
+        time_inds, baseline_inds: array of int
+            Time and baseline index of each row of visibilities.
+        """
+        if sky_accuracy is not None:
+            return self._run_multires(
+                shell, Nprocs, vis_opts, sky_accuracy, time_accuracy, **kwargs
+            )
+        if time_accuracy is not None:
+            return self._run_time_sampled(shell, Nprocs, vis_opts, time_accuracy, **kwargs)
+        return self._run_vis_calc(shell, Nprocs, times_jd, vis_opts, **kwargs)
+
+    def make_visibilities(
+        self,
+        shell,
+        Nprocs=1,
+        times_jd=None,
+        beam_pol="pI",
+        engine="direct",
+        fringe="direct",
+        redundancy=None,
+        precision="double",
+        time_block=1,
+        max_memory=None,
+        pixel_block=None,
+        accuracy=1e-6,
+        nufft_kernel="kaiser_bessel",
+        time_accuracy=None,
+        sky_accuracy=None,
+        merge_accuracy=None,
+        cull_accuracy=None,
+    ):
+        """
+        Make beam cube and fringe cube, multiply and sum.
+        shell (Npix, Nfreq) = healpix shell, as an mparray (multiprocessing shared array)
+
+        Takes a shell in Kelvin
+        Returns visibility in Jy, of shape (Nblts, Nskies, Nfreqs), or
+        (Nblts, Nskies, Nfreqs, Npols) if beam_pol is a list.
+
+        beam_pol : str or list of str
+            Polarization of the beam. With a list, the geometry and fringes are
+            computed once and shared by all the polarizations, and the beam is
+            evaluated for each. The uniform, gaussian and airy analytic beams
+            are the same for every polarization, so they are only simulated once.
+        engine : str
+            "direct" (default) evaluates the fringe of each baseline and sums it against the sky.
+            "antenna" evaluates one phasor per antenna and forms all baselines at once
+            as a matrix product per frequency. Baselines must be made from antenna positions.
+            "gemm" stores the sky frequency-major and forms all baselines at once as a
+            batched matrix product of (Nskies, Npix) by (Npix, Nbls) per frequency. This
+            makes a frequency-major copy of the sky, and requires a single beam.
+            "real" evaluates each baseline like "direct", but sums the sky against the
+            cosine and sine of the phase separately, without making complex arrays.
+            "topocentric" evaluates the beam times the fringe of each baseline once, on a
+            fixed grid of ground-based directions, and at each time resamples the sky onto
+            that grid by bilinear interpolation. The interpolation smooths the sky on the
+            scale of a pixel. Requires a single beam.
+            "ringroll" evaluates the beam times the fringe once, on the field of view of
+            the first pointing, and forms later pointings by rolling each HEALPix ring of
+            the sky. The pointings must be a whole number of equatorial pixels apart in
+            right ascension, so the time cadence is a multiple of
+            utils.ringroll_cadence(Nside). The rolls are whole pixels on the equatorial
+            rings, and fractional, with linear interpolation along the ring, on the rings
+            of the polar caps, which have fewer pixels. Precession of the pointing
+            declination is ignored. Requires a single beam.
+            "mmode" evaluates the beam times the fringe once, on the field of view of the
+            first pointing, and forms every pointing from m-modes: the Fourier transforms
+            of the sky and the kernel along each HEALPix ring. The time cadence is free.
+            Suited to long drift scans and ensembles of skies. Runs in one process, one
+            frequency at a time, so Nprocs is not used; max_memory bounds the kernel by
+            running blocks of baselines. Requires a single beam.
+            "uvgrid" grids the beam-weighted sky of each pointing and frequency onto the
+            uv plane with a non-uniform FFT, and interpolates every baseline from the grid
+            to the requested accuracy. Non-coplanar arrays also need a dozen or more w
+            layers per frequency, so it is best suited to large coplanar arrays, where its
+            cost grows slowly with the number of baselines. Requires a single beam.
+            "delay" sums each baseline over the field of view with a non-uniform FFT from
+            the pixel delays to the channels, after expanding the spectrum of every pixel
+            in as few Chebyshev polynomials as reach the accuracy. Suited to wide-band runs
+            of smooth-spectrum skies. Requires uniformly spaced channels and a single beam.
+            Times where the spectra need more than Nfreqs / 4 terms, such as noise-like
+            skies, are summed like "direct".
+            "coarse" takes the phase of the central delay of each baseline out of its
+            visibility, evaluates the slowly varying remainder directly on as few channels
+            as its delay range and the smoothness of the spectra need for the accuracy,
+            and interpolates it to every channel. Suited to short baselines and
+            smooth-spectrum skies, such as the GSM, with analytic beams. Noise-like skies,
+            such as flat_spec, are detected before the run and simulated with "direct".
+            Requires a single beam.
+        fringe : str
+            "direct" (default) evaluates cos/sin of the fringe phase on every channel.
+            "recurrence" evaluates the first channel and steps through the others by
+            complex multiplication, which requires uniformly spaced frequencies.
+            "lattice" detects a regular array layout and builds the fringe of each
+            baseline from integer powers of two lattice-vector phasors. Baselines off
+            the lattice use the direct evaluation. Only used by the "direct" engine
+            and the kernel engines.
+            The "real" engine always evaluates cos/sin directly.
+        redundancy : float
+            If set, baselines whose ENU vectors agree within this tolerance [meters]
+            are simulated once, and the result is given to every baseline in the group.
+            Requires a single beam for all antennas.
+        precision : str
+            "double" (default), or "single" to evaluate the geometry, beam and fringe in
+            float32/complex64 while summing over pixels in double precision. The error
+            relative to double precision at the first time is printed and stored in the
+            precision_error attribute. Only for the "direct" and "real" engines.
+        time_block : int or str
+            Number of consecutive pointings to evaluate together, with the geometry,
+            beam and fringes vectorized over time. "auto" chooses the largest block
+            that fits in about 256 MB per worker. Blocks of more than one pointing
+            require the "direct" or "real" engine, direct fringe evaluation and a
+            single beam. Default 1.
+        max_memory : float
+            Approximate memory budget in bytes for each worker. If set, the frequency
+            and sky axes, and for the "gemm" engine the baseline axis, are split into
+            chunks that fit, which are evaluated in turn. The results are the same.
+            The chunk sizes are printed. "auto" time blocks are also sized to fit.
+        pixel_block : int or str
+            If set, each baseline is summed over the field of view in blocks of this
+            many pixels, forming the fringe and its product with the sky one block at a
+            time so they stay in cache. "auto" sizes the blocks to about 1 MB. Only for
+            the "direct" and "real" engines with time_block 1, and not used for fringes
+            made by recurrence or from lattice phasors. Default None (no blocking).
+        accuracy : float
+            Relative accuracy of the "uvgrid", "delay" and "coarse" engines, compared to
+            the direct sum. Default 1e-6.
+        nufft_kernel : str
+            Spreading kernel of the non-uniform FFTs of the "uvgrid" and "delay" engines,
+            "kaiser_bessel" (default) or "gaussian". See utils.NUFFTPlan.
+        time_accuracy : float
+            If set, each baseline is simulated on the coarsest subset of the times that
+            its fringe rate allows, from its ENU vector, the highest frequency, the field
+            of view and the beam width, and interpolated back to every time with a
+            band-limited interpolator to this relative accuracy. Short baselines are
+            simulated at a fraction of the times. Requires uniformly spaced times and a
+            single beam, and is not used by the "mmode" engine, which evaluates every
+            time at once. The bound assumes the beam is small at the edge of the field
+            of view. Default None (every baseline at every time).
+        sky_accuracy : float
+            If set, each baseline is simulated on the lowest-resolution copy of the sky
+            that its length at the highest frequency, and the beam width, allow for this
+            accuracy, relative to the beam-weighted flux of the sky. The copies are made
+            once with SkyModel.ud_grade, so short baselines are summed over fewer pixels.
+            The bound assumes the sky is smooth on the scale of the degraded pixels; the
+            error of each copy at the first time is printed and stored in the
+            resolution_error attribute. Requires a full-sky model with a power-of-two
+            Nside and a single beam, and an engine other than ringroll. Default None
+            (every baseline at the sky's resolution).
+        merge_accuracy : float
+            If set, the field of view of each pointing is summed as a multi-order sky:
+            pixels where the beam is small are merged with their NESTED neighbours into
+            coarser pixels, up to whole base pixels, keeping the full resolution in the
+            main lobe. How far each pixel is merged follows from its beam amplitude and
+            the longest baseline, so that the visibilities of a flat sky change by at
+            most this fraction of the beam-weighted flux. The number of merged pixels
+            and the error at the first time are printed, and the error is stored in the
+            merge_error attribute. Requires a single beam, time_block 1, and the direct,
+            antenna, real, uvgrid, delay or coarse engine. Default None (no merging).
+        cull_accuracy : float
+            If set, the pixels of the field of view where the beam-weighted sky is
+            faintest are dropped, up to a threshold set so that every visibility
+            changes by at most this fraction of the zero-spacing visibility. The
+            threshold is found at each pointing and for each frequency chunk (see
+            max_memory), so chromatic beams keep the pixels they need. The number of
+            pixels kept and the error at the first time are printed, and the error is
+            stored in the cull_error attribute, with a warning if it is over the
+            accuracy. Same requirements as merge_accuracy. Default None (every pixel
+            in the field of view).
+        """
+        self._check_engine_options(engine, fringe, precision, time_block, pixel_block, max_memory)
+        self._check_accuracy_options(
+            engine,
+            time_block,
+            times_jd,
+            accuracy=accuracy,
+            nufft_kernel=nufft_kernel,
+            time_accuracy=time_accuracy,
+            sky_accuracy=sky_accuracy,
+            merge_accuracy=merge_accuracy,
+            cull_accuracy=cull_accuracy,
+        )
+        if (time_accuracy is not None or sky_accuracy is not None) and times_jd is not None:
+            # The baseline groups share the pointings.
+            if self.pointing_centers is not None:
+                warnings.warn("Overwriting existing pointing centers")
+            self.set_pointings(times_jd)
+            times_jd = None
+
+        self.freqs = np.asarray(self.freqs)
+        engine, fringe = self._fallback_engine(shell, engine, fringe, accuracy)
+        pols = [beam_pol] if isinstance(beam_pol, str) else list(beam_pol)
+        if len(pols) == 0:
+            raise ValueError("No polarizations requested.")
+        sim_pols = pols
+        if isinstance(self.beam, AnalyticBeam) and not callable(self.beam.beam_type):
+            sim_pols = pols[:1]  # Same beam for every polarization.
+        vis_opts = {
+            "beam_pol": sim_pols,
+            "engine": engine,
+            "fringe": fringe,
+            "precision": precision,
+            "time_block": time_block,
+            "pixel_block": pixel_block,
+        }
+
+        full_array = self.array
+        if redundancy is not None:
+            if isinstance(self.beam, list):
+                raise ValueError(
+                    "Redundant baseline grouping requires the same beam for all antennas."
+                )
+            bl_groups = self._redundant_groups(redundancy)
+            self.array = [full_array[g[0]] for g in bl_groups]
+            print("Redundant groups: {:d} of {:d}".format(len(bl_groups), len(full_array)))
+        calc_opts = {
+            "max_memory": max_memory,
+            "accuracy": accuracy,
+            "nufft_kernel": nufft_kernel,
+            "merge_accuracy": merge_accuracy,
+            "cull_accuracy": cull_accuracy,
+        }
+        try:
+            visibilities, time_inds, baseline_inds = self._run_engine(
+                shell, Nprocs, times_jd, vis_opts, sky_accuracy, time_accuracy, **calc_opts
+            )
+        finally:
+            self.array = full_array
+
+        if redundancy is not None:
+            # Copy each group's result to all of its members.
+            counts = np.array([len(g) for g in bl_groups])[baseline_inds]
+            visibilities = np.repeat(visibilities, counts, axis=0)
+            time_inds = np.repeat(time_inds, counts)
+            baseline_inds = np.concatenate([bl_groups[bi] for bi in baseline_inds])
+
+        srt = np.lexsort((baseline_inds, time_inds))
+        time_inds = time_inds[srt]
+        visibilities = visibilities[srt]  # Shape (Nblts, Npols * Nskies, Nfreqs)
+        time_array = self.times_jd[time_inds] if self.times_jd is not None else None
+        baseline_array = baseline_inds[srt]
+
+        # Time and baseline arrays are now Nblts
+        conv_fact = jy2Tsr(self.freqs, bm=self.healpix.pixel_area.to_value("sr"))
+        visibilities = visibilities / conv_fact
+        if isinstance(beam_pol, str):
+            return visibilities, time_array, baseline_array
+        visibilities = visibilities.reshape(
+            (visibilities.shape[0], len(sim_pols), -1, self.Nfreqs)
+        )
+        visibilities = np.repeat(visibilities, len(pols) // len(sim_pols), axis=1)
+        return np.moveaxis(visibilities, 1, -1), time_array, baseline_array
+
+    def _beam_width(self, beam_pol="pI"):
+        """
+        Width of the beam in radians, from its second moment in zenith angle.
+
+        The moment is taken over the field of view, at the highest frequency, for the
+        first polarization.
+        """
+        pols = [beam_pol] if isinstance(beam_pol, str) else list(beam_pol)
+        za = np.linspace(0, min(self._fov_radius(), np.pi / 2), 256)
+        beam = self._pol_beam_val(
+            np.zeros_like(za), za, pols[:1], np.empty((1, za.size, self.Nfreqs))
+        )
+        beam = np.abs(beam[0, :, np.argmax(self.freqs)])
+        return np.sqrt(np.sum(beam * za ** 2) / np.sum(beam))
+
+    def _max_fringe_rate(self, accuracy=1e-6, beam_pol="pI"):
+        """
+        Bound on the rate of change of the visibility of each baseline in a drift scan.
+
+        The sky turns at the sidereal rate about the Earth's axis, w. A pixel s in the
+        field of view moves its fringe at 2 pi f / c (b x w).s radians per radian of
+        rotation, which is largest at the highest frequency and the edge of the field
+        of view nearest b x w. The beam adds structure on the scale of its width, from
+        _beam_width, and adds sqrt(2 ln(1 / accuracy)) / width, as for a Gaussian beam. Beams cut off sharply
+        by the field of view have more structure than this.
+
+        Returns
+        -------
+        rate: array of float
+            Largest frequency [Hz] in the visibility time series of each baseline.
+        """
+        lat = self.telescope_location.lat.rad
+        axis = np.array([0, np.cos(lat), np.sin(lat)])  # Earth's axis, East-North-Up
+        radius = min(self._fov_radius(), np.pi / 2)
+        enu = np.array([bl.enu for bl in self.array], dtype=float).reshape(-1, 3)
+        perp = np.cross(enu, axis)
+        length = np.linalg.norm(perp, axis=1)
+        # Angle from the zenith to the nearer of +/- (b x w).
+        angle = np.arccos(np.abs(perp[:, 2]) / np.where(length > 0, length, 1))
+        fringe = 2 * np.pi * np.max(self.freqs) / c_ms * length * np.cos(
+            np.clip(angle - radius, 0, None)
+        )
+        rate = fringe + np.sqrt(2 * np.log(1 / accuracy)) / self._beam_width(beam_pol)
+
+        return rate / 86164.0989  # Cycles per sidereal day to Hz
+
+    def _run_time_sampled(self, shell, Nprocs, vis_opts, time_accuracy, **kwargs):
+        """
+        Run _run_vis_calc on a coarser time grid for each baseline, and interpolate.
+
+        Baselines are grouped by a power-of-two stride through the time array, the
+        largest that samples their visibilities at twice the Nyquist rate of
+        _max_fringe_rate. Each group is simulated on its strided times, extended by
+        the interpolator's half-width at both ends, and reconstructed at every time by
+        Kaiser-windowed sinc interpolation (_bandlimited_weights). Times on the coarse
+        grid are copied exactly. The times must be uniformly spaced.
+
+        kwargs are passed to _run_vis_calc.
+
+        Returns
+        -------
+        visibilities: array of complex
+            Unsorted visibilities, shape (Nblts, Npols * Nskies, Nfreqs)
+        time_inds, baseline_inds: array of int
+            Time and baseline index of each row of visibilities.
+        """
+        self.healpix = HEALPix(nside=shell.Nside)
+        times = np.asarray(self.times_jd, dtype=float)
+        Ntimes = times.size
+        dt = _uniform_step(times, rtol=1e-3) * 86400  # Seconds
+        rate = self._max_fringe_rate(time_accuracy, vis_opts["beam_pol"])
+        stride = np.floor(np.clip(1 / (4 * rate * dt), 1, Ntimes))
+        stride = 2 ** np.floor(np.log2(stride)).astype(int)
+        width = _kaiser_sinc(time_accuracy)[0]
+
+        full_array = self.array
+        pointings = (self.times_jd, self.pointing_centers, self.north_poles)
+        visibilities, time_inds, baseline_inds = [], [], []
+        try:
+            for k in np.unique(stride)[::-1]:
+                group = np.flatnonzero(stride == k)
+                self.array = [full_array[bi] for bi in group]
+                Ncoarse = (Ntimes - 1) // k + 2 + 2 * width
+                if Ncoarse >= Ntimes:
+                    k, Ncoarse = 1, Ntimes
+                print(
+                    "Time sampling: {:d} baselines at {:d} of {:d} times".format(
+                        group.size, Ncoarse, Ntimes
+                    )
+                )
+                if k == 1:
+                    self.times_jd, self.pointing_centers, self.north_poles = pointings
+                    vis, ti, bi = self._run_vis_calc(shell, Nprocs, None, vis_opts, **kwargs)
+                else:
+                    self.set_pointings(times[0] + (np.arange(Ncoarse) - width) * k * dt / 86400)
+                    vis, ti, bi = self._run_vis_calc(shell, Nprocs, None, vis_opts, **kwargs)
+                    srt = np.lexsort((bi, ti))
+                    vis = vis[srt].reshape((Ncoarse, group.size) + vis.shape[1:])
+                    weights = _bandlimited_weights(
+                        np.arange(Ntimes) / k + width, Ncoarse, time_accuracy
+                    )
+                    vis = np.tensordot(weights, vis, axes=1).reshape((-1,) + vis.shape[2:])
+                    ti = np.repeat(np.arange(Ntimes), group.size)
+                    bi = np.tile(np.arange(group.size), Ntimes)
+                visibilities.append(vis)
+                time_inds.append(ti)
+                baseline_inds.append(group[bi])
+        finally:
+            self.array = full_array
+            self.times_jd, self.pointing_centers, self.north_poles = pointings
+            self.Ntimes = Ntimes
+
+        return (
+            np.concatenate(visibilities),
+            np.concatenate(time_inds),
+            np.concatenate(baseline_inds),
+        )
+
+    def _resolution_nsides(self, nside, accuracy=1e-3, beam_pol="pI"):
+        """
+        Lowest HEALPix Nside for each baseline that sums the sky to an accuracy.
+
+        Averaging the sky over pixels of side theta = sqrt(pi / 3) / Nside changes a
+        fringe of u wavelengths by about (2 pi u theta)^2 / 24, relative, for skies that
+        are smooth on the scale of the pixels. u is the baseline length at the highest
+        frequency plus the spatial frequency of the beam, sqrt(2 ln(1 / accuracy)) /
+        (2 pi width), as in _max_fringe_rate.
+
+        Returns
+        -------
+        nsides: array of int
+            Powers of two from 8 up to nside, one per baseline.
+        """
+        enu = np.array([bl.enu for bl in self.array], dtype=float).reshape(-1, 3)
+        u = np.linalg.norm(enu, axis=1) * np.max(self.freqs) / c_ms
+        u += np.sqrt(2 * np.log(1 / accuracy)) / (2 * np.pi * self._beam_width(beam_pol))
+        need = 2 * np.pi * u * np.sqrt(np.pi / 3) / np.sqrt(24 * accuracy)
+        nsides = 2 ** np.ceil(np.log2(np.clip(need, 8, None))).astype(int)
+        return np.minimum(nsides, nside)
+
+    def _resolution_error(self, shell, sky, beam_pol="pI"):
+        """
+        Difference between the visibilities on a sky and a degraded copy.
+
+        The baselines in self.array and a zero-spacing baseline are evaluated at the
+        first pointing with the direct engine on both skies. The largest difference is
+        relative to the zero-spacing visibility on the sky, the beam-weighted flux that
+        bounds every baseline.
+        """
+        north = self.north_poles[0] if self.north_poles is not None else None
+        array = self.array
+        self.array = list(array) + [Baseline(enu_vec=np.zeros(3))]
+        vis = []
+        try:
+            for model in [shell, sky]:
+                self.healpix = HEALPix(nside=model.Nside)
+                self._set_vectors()
+                self._prepare_engine()
+                vis.append(
+                    self._vis_time(
+                        self.pointing_centers[0], north, model.data, beam_pol=beam_pol
+                    )
+                    * model.pix_area_sr
+                )
+        finally:
+            self.array = array
+
+        return np.max(np.abs(vis[1] - vis[0])) / np.max(np.abs(vis[0][-1]))
+
+    def _run_multires(self, shell, Nprocs, vis_opts, sky_accuracy, time_accuracy=None, **kwargs):
+        """
+        Run _run_vis_calc for groups of baselines on degraded copies of the sky.
+
+        Baselines are grouped by the Nside of _resolution_nsides. The sky is degraded
+        once for each group with SkyModel.ud_grade, in shared memory if the sky is, and
+        the results are scaled to the pixel area of the sky. The relative error of each
+        degraded group at the first pointing is printed and stored in the
+        resolution_error attribute, by Nside. With time_accuracy set, each group is run
+        by _run_time_sampled.
+
+        kwargs are passed to _run_vis_calc.
+
+        Returns
+        -------
+        visibilities: array of complex
+            Unsorted visibilities, shape (Nblts, Npols * Nskies, Nfreqs)
+        time_inds, baseline_inds: array of int
+            Time and baseline index of each row of visibilities.
+        """
+        self.healpix = HEALPix(nside=shell.Nside)
+        nsides = self._resolution_nsides(shell.Nside, sky_accuracy, vis_opts["beam_pol"])
+        shared = isinstance(shell.data, mparray)
+        full_array = self.array
+        self.resolution_error = {}
+        visibilities, time_inds, baseline_inds = [], [], []
+        try:
+            for nside in np.unique(nsides):
+                group = np.flatnonzero(nsides == nside)
+                self.array = [full_array[bi] for bi in group]
+                print("Sky resolution: {:d} baselines at Nside {:d}".format(group.size, nside))
+                sky = shell
+                if nside < shell.Nside:
+                    sky = shell.ud_grade(nside, shared_memory=shared)
+                    self.resolution_error[nside] = self._resolution_error(
+                        shell, sky, vis_opts["beam_pol"]
+                    )
+                    print(
+                        "Sky resolution error at Nside {:d}: {:.3e}".format(
+                            nside, self.resolution_error[nside]
+                        )
+                    )
+                if time_accuracy is None:
+                    vis, ti, bi = self._run_vis_calc(sky, Nprocs, None, vis_opts, **kwargs)
+                else:
+                    vis, ti, bi = self._run_time_sampled(
+                        sky, Nprocs, vis_opts, time_accuracy, **kwargs
+                    )
+                # Sums over the pixels of the degraded sky, in units of the sky's pixels.
+                visibilities.append(vis * (shell.Nside / nside) ** 2)
+                time_inds.append(ti)
+                baseline_inds.append(group[bi])
+        finally:
+            self.array = full_array
+            self.healpix = HEALPix(nside=shell.Nside)
+
+        return (
+            np.concatenate(visibilities),
+            np.concatenate(time_inds),
+            np.concatenate(baseline_inds),
+        )
+
+    def _kernel_bytes(self, Nbls, beam_pol="pI"):
+        """
+        Approximate memory in bytes of the kernel of the kernel engines for Nbls baselines.
+        """
+        Npols = 1 if isinstance(beam_pol, str) else len(beam_pol)
+        return 16 * self.Nfreqs * self._max_fov_npix() * Nbls * Npols
+
+    def _run_baseline_blocks(self, shell, Nprocs, vis_opts, Nbl_block, **kwargs):
+        """
+        Run _run_vis_calc for blocks of Nbl_block baselines, one after the other.
+
+        Used by the kernel engines, whose kernels hold every baseline at once, so
+        that each kernel fits the memory budget. kwargs are passed to _run_vis_calc.
+
+        Returns
+        -------
+        visibilities: array of complex
+            Unsorted visibilities, shape (Nblts, Npols * Nskies, Nfreqs)
+        time_inds, baseline_inds: array of int
+            Time and baseline index of each row of visibilities.
+        """
+        full_array = self.array
+        visibilities, time_inds, baseline_inds = [], [], []
+        try:
+            for b0 in range(0, len(full_array), Nbl_block):
+                self.array = list(full_array[b0 : b0 + Nbl_block])
+                vis, ti, bi = self._run_vis_calc(shell, Nprocs, None, vis_opts, **kwargs)
+                visibilities.append(vis)
+                time_inds.append(ti)
+                baseline_inds.append(bi + b0)
+        finally:
+            self.array = full_array
+
+        return (
+            np.concatenate(visibilities),
+            np.concatenate(time_inds),
+            np.concatenate(baseline_inds),
+        )
+
+    def _run_vis_calc(
+        self,
+        shell,
+        Nprocs,
+        times_jd,
+        vis_opts,
+        max_memory=None,
+        accuracy=1e-6,
+        nufft_kernel="kaiser_bessel",
+        merge_accuracy=None,
+        cull_accuracy=None,
+    ):
+        """
+        Run _vis_calc on Nprocs subprocesses and gather the results.
+
+        vis_opts is the dictionary of keyword arguments to _vis_calc, max_memory
+        the memory budget, accuracy and nufft_kernel the options of the NUFFT
+        engines, and merge_accuracy and cull_accuracy those of the multi-order sky
+        and beam culling. See make_visibilities.
+
+        Returns
+        -------
+        visibilities: array of complex
+            Unsorted visibilities, summed over pixels in Kelvin,
+            shape (Nblts, Npols * Nskies, Nfreqs)
+        time_inds, baseline_inds: array of int
+            Time and baseline index of each row of visibilities.
+        """
+        single = vis_opts["precision"] == "single"
+        self.healpix = HEALPix(nside=shell.Nside)
+        self._set_vectors(dtype=np.float32 if single else float)
+        Nfreqs = shell.Nfreqs
+
+        assert Nfreqs == self.Nfreqs
+
+        self.time0 = time.time()
+
+        if self.pointing_centers is None and times_jd is None:
+            raise ValueError(
+                "Observatory.pointing_centers must be set using set_pointings() before simulation can begin."
+            )
+
+        if times_jd is not None:
+            if self.pointing_centers is not None:
+                warnings.warn("Overwriting existing pointing centers")
+            self.set_pointings(times_jd)
+
+        if max_memory is not None and vis_opts["engine"] in ["topocentric", "ringroll", "mmode"]:
+            # The kernel of each block of baselines takes half the budget.
+            per_bl = self._kernel_bytes(1, vis_opts["beam_pol"])
+            Nbl_block = max(1, int(max_memory // (2 * per_bl)))
+            Nkernel = min(Nbl_block, len(self.array))
+            print(
+                "Memory budget {:.3g} GB: kernel of {:d}/{:d} baselines, {:.3g} GB".format(
+                    max_memory / 1e9, Nkernel, len(self.array), Nkernel * per_bl / 1e9
+                )
+            )
+            if Nbl_block < len(self.array):
+                return self._run_baseline_blocks(
+                    shell,
+                    Nprocs,
+                    vis_opts,
+                    Nbl_block,
+                    max_memory=max_memory,
+                    accuracy=accuracy,
+                    nufft_kernel=nufft_kernel,
+                    merge_accuracy=merge_accuracy,
+                    cull_accuracy=cull_accuracy,
+                )
+
+        self._prepare_engine(
+            vis_opts["engine"],
+            vis_opts["fringe"],
+            vis_opts["beam_pol"],
+            accuracy=accuracy,
+            nufft_kernel=nufft_kernel,
+            merge_accuracy=merge_accuracy,
+            cull_accuracy=cull_accuracy,
+        )
+
+        self.Ntimes = len(self.pointing_centers)
+        if vis_opts["engine"] == "mmode":
+            return self._mmode_vis(shell.data, vis_opts["beam_pol"], vis_opts["fringe"])
+        Nskies, Npols = shell.data.shape[0], len(vis_opts["beam_pol"])
+        time_block = vis_opts["time_block"]
+        if max_memory is None:
+            chunks = (self.Nfreqs, Nskies, 2 ** 28)
+        else:
+            chunks = self._chunk_sizes(
+                max_memory,
+                Nskies,
+                Npols=Npols,
+                Nblock=1 if time_block == "auto" else time_block,
+                engine=vis_opts["engine"],
+                precision=vis_opts["precision"],
+            )
+            msg = "Memory budget {:.3g} GB: chunks of {:d}/{:d} channels, {:d}/{:d} skies".format(
+                max_memory / 1e9, chunks[0], self.Nfreqs, chunks[1], Nskies
+            )
+            if vis_opts["engine"] == "gemm":
+                Nbl_chunk = max(1, int(chunks[2] // (16 * chunks[0] * self._max_fov_npix())))
+                msg += ", {:d}/{:d} baselines".format(min(Nbl_chunk, len(self.array)), len(self.array))
+            print(msg)
+        if time_block == "auto":
+            time_block = self._time_block_size(
+                chunks[1],
+                vis_opts["precision"],
+                budget=2 ** 28 if max_memory is None else max_memory,
+                Npols=Npols,
+                Nfreqs=chunks[0],
+            )
+            print("Time block: {:d} pointings".format(time_block))
+        pixel_block = vis_opts["pixel_block"]
+        if pixel_block == "auto":
+            pixel_block = self._pixel_block_size(
+                chunks[1], vis_opts["precision"], Npols=Npols, Nfreqs=chunks[0]
+            )
+            print("Pixel block: {:d} pixels".format(pixel_block))
+        vis_opts = dict(vis_opts, time_block=time_block, chunks=chunks, pixel_block=pixel_block)
+        pcenter_list = np.array_split(self.pointing_centers, Nprocs)
+        time_inds = np.array_split(range(self.Ntimes), Nprocs)
+        procs = []
+        man = mp.Manager()
+        vis_array = man.Queue()
+        Nfin = mp.Value("i", 0)
+
+        if Nprocs > 1 and not isinstance(shell.data, mparray):
+            warnings.warn(
+                "Caution: SkyModel data array is not in shared memory. With Nprocs > 1, "
+                "this will cause duplication."
+            )
+
+        data = shell.data
+        if vis_opts["engine"] == "gemm":
+            # Frequency-major copy of the sky, shape (Nfreqs, Nskies, Npix)
+            if isinstance(shell.data, mparray):
+                data = mparray((Nfreqs,) + shell.data.shape[:-1], dtype=float)
+                data[()] = np.moveaxis(shell.data, -1, 0)
+            else:
+                data = np.ascontiguousarray(np.moveaxis(shell.data, -1, 0))
+
+        for pi in range(Nprocs):
+            p = mp.Process(
+                name=str(pi),
+                target=self._vis_calc,
+                args=(pcenter_list[pi], time_inds[pi], data, vis_array, Nfin),
+                kwargs=vis_opts,
+            )
+            p.start()
+            procs.append(p)
+        while (Nfin.value < self.Ntimes) and np.any([p.is_alive() for p in procs]):
+            continue
+        visibilities = []
+        time_inds, baseline_inds = [], []
+        for (ti, bi, varr) in iter(vis_array.get, None):
+            visibilities.append(varr)
+            time_inds.append(ti)
+            baseline_inds.append(bi)
+            if vis_array.empty():
+                break
+        visibilities = np.concatenate(visibilities)
+        time_inds, baseline_inds = np.concatenate(time_inds), np.concatenate(baseline_inds)
+
+        if single:
+            # Compare the first time against double precision.
+            self._set_vectors()
+            north = self.north_poles[0] if self.north_poles is not None else None
+            vis_double = self._vis_time(
+                self.pointing_centers[0],
+                north,
+                shell.data,
+                beam_pol=vis_opts["beam_pol"],
+                engine=vis_opts["engine"],
+                fringe=vis_opts["fringe"],
+            )
+            first = time_inds == 0
+            vis_single = visibilities[first][np.argsort(baseline_inds[first])]
+            self.precision_error = np.max(np.abs(vis_single - vis_double)) / np.max(
+                np.abs(vis_double)
+            )
+            print("Single precision relative error: {:.3e}".format(self.precision_error))
+
+        if cull_accuracy is not None:
+            self.cull_error = self._reduction_error(shell.data, "_cull", vis_opts["beam_pol"])
+            pix, beam_cube, sky = self._first_fov(shell.data, vis_opts["beam_pol"])
+            print(
+                "Beam culling: {:d} of {:d} pixels, relative error {:.3e}".format(
+                    self._cull_pixels(sky).size, pix.size, self.cull_error
+                )
+            )
+            if self.cull_error > cull_accuracy:
+                warnings.warn(
+                    "Beam culling error {:.3e} is over cull_accuracy {:.3e}.".format(
+                        self.cull_error, cull_accuracy
+                    )
+                )
+        if merge_accuracy is not None:
+            self.merge_error = self._reduction_error(shell.data, "_merge", vis_opts["beam_pol"])
+            pix, beam_cube, sky = self._first_fov(shell.data, vis_opts["beam_pol"])
+            if cull_accuracy is not None:
+                keep = self._cull_pixels(sky)
+                pix, beam_cube = pix[keep], beam_cube[:, keep]
+            print(
+                "Multi-order sky: {:d} of {:d} pixels, relative error {:.3e}".format(
+                    self._merge_groups(pix, beam_cube)[1].size, pix.size, self.merge_error
+                )
+            )
+
+        return visibilities, time_inds, baseline_inds
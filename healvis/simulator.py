@@ -643,9 +643,60 @@ def setup_observatory_from_uvdata(
     return obs
 
 
+def _visibility_options(param_dict):
+    """
+    Pop the Observatory.make_visibilities options of run_simulation from param_dict.
+
+    Numbers are cast to float, since yaml reads values like 4e9 as strings.
+    """
+    opts = {
+        "engine": param_dict.pop("engine", "direct"),
+        "fringe": param_dict.pop("fringe", "direct"),
+        "precision": param_dict.pop("precision", "double"),
+        "time_block": param_dict.pop("time_block", 1),
+        "pixel_block": param_dict.pop("pixel_block", None),
+        "accuracy": float(param_dict.pop("accuracy", 1e-6)),
+        "nufft_kernel": param_dict.pop("nufft_kernel", "kaiser_bessel"),
+    }
+    for key in [
+        "redundancy",
+        "max_memory",
+        "time_accuracy",
+        "sky_accuracy",
+        "merge_accuracy",
+        "cull_accuracy",
+    ]:
+        value = param_dict.pop(key, None)
+        opts[key] = None if value is None else float(value)
+
+    return opts
+
+
 def run_simulation(param_file, Nprocs=1, sjob_id=None, add_to_history=""):
     """
     Parse input parameter file, construct UVData and SkyModel objects, and run simulation.
+
+    Optional top-level parameters select how the visibilities are computed, and are
+    passed to Observatory.make_visibilities:
+        engine : str, visibility engine, e.g. "direct", "antenna", "gemm", "real", "topocentric",
+            "ringroll", "mmode", "uvgrid", "delay" or "coarse". For "ringroll", time_cadence in the time section may be given
+            as "ringroll", for one equatorial pixel of the sky model per time step.
+        fringe : str, fringe evaluation method, "direct", "recurrence" or "lattice"
+        redundancy : float, tolerance [meters] for simulating redundant baselines once
+        precision : str, "double" or "single"
+        time_block : int or "auto", number of pointings to evaluate together
+        max_memory : float, memory budget per process [bytes]
+        pixel_block : int or "auto", number of pixels summed together per baseline
+        accuracy : float, relative accuracy of the "uvgrid", "delay" and "coarse" engines
+        nufft_kernel : str, "kaiser_bessel" or "gaussian" NUFFT spreading kernel
+        time_accuracy : float, if set, simulate each baseline on the coarsest times its
+            fringe rate allows and interpolate to this relative accuracy
+        sky_accuracy : float, if set, simulate each baseline on the lowest-resolution
+            copy of the sky its length allows for this relative accuracy
+        merge_accuracy : float, if set, merge pixels where the beam is small into coarser
+            multi-order pixels, to this fraction of the beam-weighted flux
+        cull_accuracy : float, if set, drop the pixels where the beam is smallest, up to
+            this fraction of the beam-weighted flux
     """
     # parse parameter dictionary
     if isinstance(param_file, str):
@@ -658,8 +709,6 @@ def run_simulation(param_file, Nprocs=1, sjob_id=None, add_to_history=""):
     freq_dict = parse_frequency_params(param_dict["freq"])
     freq_array = freq_dict["freq_array"][0]
 
-    time_dict = parse_time_params(param_dict["time"])
-    time_array = time_dict["time_array"]
     filing_params = param_dict["filing"]
 
     # ---------------------------
@@ -701,6 +750,13 @@ def run_simulation(param_file, Nprocs=1, sjob_id=None, add_to_history=""):
         if savepath is not None:
             sky.write_hdf5(savepath)
 
+    # The "ringroll" cadence turns the sky by one equatorial pixel of the sky model.
+    time_params = param_dict["time"]
+    if time_params.get("time_cadence") == "ringroll":
+        time_params = dict(time_params, time_cadence=utils.ringroll_cadence(sky.Nside))
+    time_dict = parse_time_params(time_params)
+    time_array = time_dict["time_array"]
+
     # ---------------------------
     # UVData object
     # ---------------------------
@@ -735,6 +791,7 @@ def run_simulation(param_file, Nprocs=1, sjob_id=None, add_to_history=""):
     smooth_beam = beam_attr.pop("smooth_beam", False)
     smooth_scale = beam_attr.pop("smooth_scale", None)
     apply_horizon_taper = param_dict.pop("do_horizon_taper", False)
+    vis_opts = _visibility_options(param_dict)
     points = param_dict.pop("pointings", None)
     set_pointings = True
     if points is not None:
@@ -758,22 +815,21 @@ def run_simulation(param_file, Nprocs=1, sjob_id=None, add_to_history=""):
     # Run simulation
     # ---------------------------
     print("Running simulation", flush=True)
-    visibility = []
     beam_sq_int = {}
     print(f"Nskies: {sky.Nskies}", flush=True)
+    # calculate visibility for all polarizations, shape (Nblts, Nskies, Nfreqs, Npols)
+    visibility, time_array, baseline_inds = obs.make_visibilities(
+        sky,
+        Nprocs=Nprocs,
+        beam_pol=pols,
+        **vis_opts,
+    )
     for pol in pols:
-        # calculate visibility
-        visibs, time_array, baseline_inds = obs.make_visibilities(
-            sky, Nprocs=Nprocs, beam_pol=pol
-        )
-        visibility.append(visibs)
         # Average Beam^2 integral across frequency
         beam_sq_int[f"bm_sq_{pol}"] = obs.beam_sq_int(
             sky.ref_freq, sky.Nside, obs.pointing_centers[0], beam_pol=pol
         ).item()
 
-    visibility = np.moveaxis(visibility, 0, -1)
-
     # ---------------------------
     # Fill in the UVData object and write out.
     # ---------------------------
@@ -938,16 +994,10 @@ def run_simulation_partial_freq(
         smooth_scale=smooth_scale,
     )
 
-    # run simulation
-    visibility = []
-    for pol in pols:
-        # calculate visibility
-        visibs, time_array, baseline_inds = obs.make_visibilities(
-            sky, Nprocs=Nprocs, beam_pol=pol
-        )
-        visibility.append(visibs)
-
-    visibility = np.moveaxis(visibility, 0, -1)
+    # run simulation, for all polarizations at once
+    visibility, time_array, baseline_inds = obs.make_visibilities(
+        sky, Nprocs=Nprocs, beam_pol=pols
+    )
     flags = np.zeros_like(visibility, bool)
     nsamples = np.ones_like(visibility, float)
 
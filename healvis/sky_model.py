@@ -10,7 +10,7 @@ with warnings.catch_warnings():  # noqa
     warnings.simplefilter("ignore", FutureWarning)
     import h5py
 
-from .utils import mparray, npix2nside
+from .utils import mparray, npix2nside, ud_grade
 from .cosmology import f21, comoving_voxel_volume, comoving_distance
 from .version import history_string
 
@@ -139,6 +139,31 @@ class SkyModel(object):
                     self.data = self.data.reshape((1,) + s)
         self._updated = []
 
+    def ud_grade(self, Nside, shared_memory=False):
+        """
+        Return a copy of this SkyModel degraded to a lower Nside by averaging pixels.
+
+        Nside = Nside of the copy, a power of two
+        shared_memory = put data in a multiprocessing shared memory block
+        """
+        if self.Npix != 12 * self.Nside ** 2:
+            raise ValueError("Only full-sky models can be degraded.")
+        data = ud_grade(self.data, Nside)
+        if shared_memory:
+            shared = mparray(data.shape, dtype=float)
+            shared[()] = data
+            data = shared
+        return SkyModel(
+            Nside=Nside,
+            freqs=self.freqs,
+            Nskies=self.Nskies,
+            ref_chan=self.ref_chan,
+            ref_freq=self.ref_freq,
+            pspec_amp=self.pspec_amp,
+            data=data,
+            history=self.history,
+        )
+
     def make_flat_spectrum_shell(self, sigma, shared_memory=False):
         """
         sigma = Spectrum amplitude
@@ -6,6 +6,7 @@ import numpy as np
 import os
 import pytest
 from astropy_healpix import healpy as hp
+from astropy_healpix import HEALPix
 from astropy.time import Time
 from astropy.coordinates import EarthLocation, AltAz, ICRS, Angle
 from os import environ
@@ -289,3 +290,499 @@ def test_az_za_astropy():
     assert np.allclose(
         np.unwrap(az0 - az), 0.0, atol=3e-4
     )  # About 1 arcmin precision. Worst is at the southern horizon.
+
+
+def _engine_setup(Nskies=2, Nside=16, Nfreqs=4, fov=120, Ntimes=2, ants=None):
+    # Small random array and noise-like sky shared by the engine comparison tests.
+    np.random.seed(10)
+    if ants is None:
+        ants = np.random.uniform(-20, 20, (5, 3))
+        ants[:, 2] = 0.0
+    bls = []
+    for i in range(len(ants)):
+        for j in range(i + 1, len(ants)):
+            bls.append(observatory.Baseline(ants[i], ants[j], i, j))
+    freqs = np.linspace(100e6, 120e6, Nfreqs)
+    obs = observatory.Observatory(latitude, longitude, array=bls, freqs=freqs, fov=fov)
+    t0 = Time("J2000").jd
+    obs.set_pointings(np.linspace(t0, t0 + 0.1, Ntimes))
+    obs.set_beam("gaussian", gauss_width=20)
+    sky = sky_model.SkyModel(Nside=Nside, freqs=freqs, Nskies=Nskies)
+    sky.make_flat_spectrum_shell(1.0)
+    return obs, sky
+
+
+def _hex37_layout():
+    # ENU antenna positions of the 37-element hexagonal array, shape (37, 3).
+    return np.genfromtxt(
+        os.path.join(DATA_PATH, "perfect_hex37_14.6m.csv"), skip_header=1, usecols=(3, 4, 5)
+    )
+
+
+def _zero_spacing_flux(obs, sky):
+    # Beam-weighted flux of the sky, the largest visibility of a zero-spacing baseline.
+    array = obs.array
+    obs.array = [observatory.Baseline(enu_vec=np.zeros(3))]
+    try:
+        return np.abs(obs.make_visibilities(sky)[0]).max()
+    finally:
+        obs.array = array
+
+
+def test_antenna_engine():
+    obs, sky = _engine_setup()
+    vis0, times0, bls0 = obs.make_visibilities(sky)
+    vis1, times1, bls1 = obs.make_visibilities(sky, engine="antenna")
+    assert vis1.shape == vis0.shape
+    assert np.all(bls0 == bls1)
+    assert np.allclose(vis0, vis1)
+
+    # Baselines without antenna positions are rejected.
+    obs.array = [observatory.Baseline(enu_vec=np.array([14.6, 0, 0]))]
+    pytest.raises(ValueError, obs._antenna_positions)
+    pytest.raises(ValueError, obs.make_visibilities, sky, engine="fast")
+
+
+def test_fringe_recurrence():
+    bl = observatory.Baseline(np.array([0.0, 0, 0]), np.array([140.0, 25.0, 1.0]))
+    Npix = 50
+    az = np.linspace(0, 2 * np.pi, Npix)
+    za = np.linspace(0, np.pi / 2, Npix)
+    freqs = np.linspace(100e6, 200e6, 300)
+    fringe0 = bl.get_fringe(az, za, freqs)
+    fringe1 = bl.get_fringe(az, za, freqs, method="recurrence")
+    assert fringe1.shape == fringe0.shape
+    assert np.allclose(fringe0, fringe1, rtol=0, atol=1e-12)
+
+    # Irregular channels fall back to the direct evaluation.
+    freqs = np.sort(np.random.uniform(100e6, 200e6, 20))
+    fringe0 = bl.get_fringe(az, za, freqs)
+    fringe1 = bl.get_fringe(az, za, freqs, method="recurrence")
+    assert np.all(fringe0 == fringe1)
+
+    obs, sky = _engine_setup(Nfreqs=40)
+    vis0, _, _ = obs.make_visibilities(sky)
+    for engine in ["direct", "antenna"]:
+        vis1, _, _ = obs.make_visibilities(sky, engine=engine, fringe="recurrence")
+        assert np.allclose(vis0, vis1)
+
+
+def test_lattice_fringe():
+    layout = _hex37_layout()
+    obs, sky = _engine_setup(ants=layout[:12], Nskies=1)
+    # One baseline off the lattice.
+    obs.array.append(observatory.Baseline(layout[0], layout[5] + np.array([3.1, 0.2, 0])))
+    basis, coeffs, on_lattice = obs._lattice_basis()
+    assert np.allclose(np.linalg.norm(basis, axis=1), 14.6, atol=1e-2)
+    assert np.all(on_lattice[:-1]) and not on_lattice[-1]
+    assert np.allclose(np.dot(coeffs[:-1], basis), [bl.enu for bl in obs.array[:-1]], atol=1e-3)
+
+    vis0, _, _ = obs.make_visibilities(sky)
+    vis1, _, _ = obs.make_visibilities(sky, fringe="lattice")
+    assert np.allclose(vis0, vis1, rtol=1e-4, atol=1e-4 * np.abs(vis0).max())
+
+
+def test_redundant_groups():
+    layout = _hex37_layout()
+    obs, sky = _engine_setup(ants=layout[:7], Nskies=1)
+    groups = obs._redundant_groups(1e-3)
+    assert len(groups) == 6  # Seven antennas on a line
+    assert sorted(sum(groups, [])) == list(range(len(obs.array)))
+
+    vis0, times0, bls0 = obs.make_visibilities(sky)
+    vis1, times1, bls1 = obs.make_visibilities(sky, redundancy=1e-3)
+    assert np.all(times0 == times1) and np.all(bls0 == bls1)
+    assert np.allclose(vis0, vis1)
+    assert len(obs.array) == 21
+
+
+def test_conjugate_baselines():
+    obs, sky = _engine_setup()
+    ants = np.random.uniform(-20, 20, (3, 3))
+    obs.array = [
+        observatory.Baseline(ants[0], ants[1]),
+        observatory.Baseline(ants[1], ants[0]),
+        observatory.Baseline(ants[2], ants[2]),
+        observatory.Baseline(ants[0], ants[2]),
+        observatory.Baseline(ants[2], ants[0]),
+        observatory.Baseline(ants[0], ants[1]),
+    ]
+    autos, conj_of = obs._conjugate_baselines()
+    assert np.all(autos == [False, False, True, False, False, False])
+    assert np.all(conj_of == [-1, 0, -1, -1, 3, -1])
+
+    vis, times, bls = obs.make_visibilities(sky)
+    vis = vis.reshape(obs.Ntimes, len(obs.array), sky.Nskies, sky.Nfreqs)
+    assert np.allclose(vis[:, 1], vis[:, 0].conj())
+    assert np.allclose(vis[:, 4], vis[:, 3].conj())
+    assert np.allclose(vis[:, 5], vis[:, 0])
+    assert np.all(vis[:, 2].imag == 0)
+
+
+def test_gemm_engine():
+    obs, sky = _engine_setup(Nskies=3, Nfreqs=6)
+    vis0, times0, bls0 = obs.make_visibilities(sky)
+    for fringe in ["direct", "recurrence"]:
+        vis1, times1, bls1 = obs.make_visibilities(sky, engine="gemm", fringe=fringe)
+        assert np.all(bls0 == bls1)
+        assert np.allclose(vis0, vis1)
+
+    # Small chunks of baselines give the same result.
+    za, az, pix = obs.calc_azza(obs.pointing_centers[0], return_inds=True)
+    sky_fm = np.moveaxis(sky.data[:, pix, :], -1, 0)
+    vis_big = obs._gemm_vis(az, za, sky_fm)
+    vis_small = obs._gemm_vis(az, za, sky_fm, chunk_bytes=1)
+    assert np.allclose(vis_big, vis_small)
+
+
+def test_real_engine():
+    obs, sky = _engine_setup(Nskies=2, Nfreqs=5)
+    vis0, times0, bls0 = obs.make_visibilities(sky)
+    vis1, times1, bls1 = obs.make_visibilities(sky, engine="real")
+    assert np.all(bls0 == bls1)
+    assert np.allclose(vis0, vis1)
+
+
+def test_single_precision():
+    obs, sky = _engine_setup(Nskies=1, Nfreqs=5)
+    vis0, times0, bls0 = obs.make_visibilities(sky)
+    for engine in ["direct", "real"]:
+        vis1, times1, bls1 = obs.make_visibilities(sky, engine=engine, precision="single")
+        assert vis1.dtype == np.complex128
+        err = np.max(np.abs(vis1 - vis0)) / np.max(np.abs(vis0))
+        assert err < 1e-4
+        assert np.isclose(obs.precision_error, err, rtol=0.5, atol=1e-7)
+    assert obs._vecs.dtype == np.float64
+    pytest.raises(ValueError, obs.make_visibilities, sky, engine="gemm", precision="single")
+
+
+def test_workspace():
+    obs, sky = _engine_setup(Nskies=2, Nfreqs=5, Ntimes=3)
+    obs.healpix = HEALPix(nside=sky.Nside)
+    obs._set_vectors()
+    obs._prepare_engine()
+    ws = obs._workspace(sky.Nskies)
+    for ti, center in enumerate(obs.pointing_centers):
+        za0, az0, pix0 = obs.calc_azza(center, obs.north_poles[ti], return_inds=True)
+        za1, az1, pix1 = obs.calc_azza(
+            center, obs.north_poles[ti], return_inds=True, workspace=ws
+        )
+        assert np.all(pix0 == pix1)
+        assert np.allclose(za0, za1) and np.allclose(az0, az1)
+        assert pix1.size <= obs._max_fov_npix()
+
+        vis0 = obs._vis_time(center, obs.north_poles[ti], sky.data)
+        vis1 = obs._vis_time(center, obs.north_poles[ti], sky.data, workspace=ws)
+        assert np.allclose(vis0, vis1)
+        if ti == 0:
+            buffers = dict(ws._buffers)
+        # Later pointings reuse the buffers.
+        assert all(ws._buffers[k] is buffers[k] for k in buffers)
+
+
+def test_time_block():
+    obs, sky = _engine_setup(Nskies=2, Nfreqs=5, Ntimes=7)
+    obs.do_horizon_taper = True
+    vis0, times0, bls0 = obs.make_visibilities(sky)
+    for engine in ["direct", "real"]:
+        for block in [3, "auto"]:
+            vis1, times1, bls1 = obs.make_visibilities(
+                sky, engine=engine, time_block=block, Nprocs=2
+            )
+            assert np.all(times0 == times1) and np.all(bls0 == bls1)
+            assert np.allclose(vis0, vis1)
+    assert obs._time_block_size(sky.Nskies) > 7
+    assert obs._time_block_size(sky.Nskies, budget=0) == 1
+    pytest.raises(ValueError, obs.make_visibilities, sky, time_block=0)
+    pytest.raises(ValueError, obs.make_visibilities, sky, engine="gemm", time_block=2)
+    pytest.raises(ValueError, obs.make_visibilities, sky, fringe="lattice", time_block=2)
+
+
+def test_multi_pol():
+    obs, sky = _engine_setup(Nskies=2, Nfreqs=5, Ntimes=3)
+
+    def pol_beam(za, freqs, pol="pI", **kwargs):
+        width = {"xx": 0.3, "yy": 0.4}[pol]
+        return np.exp(-(za[:, np.newaxis] ** 2) / (2 * width ** 2)) * np.ones_like(freqs)
+
+    obs.set_beam(pol_beam)
+    for engine, block in [("direct", 1), ("real", 3), ("antenna", 1), ("gemm", 1)]:
+        vis, times, bls = obs.make_visibilities(
+            sky, beam_pol=["xx", "yy"], engine=engine, time_block=block
+        )
+        assert vis.shape == (len(times), sky.Nskies, sky.Nfreqs, 2)
+        for pi, pol in enumerate(["xx", "yy"]):
+            vis_pol, _, _ = obs.make_visibilities(sky, beam_pol=pol)
+            assert np.allclose(vis[..., pi], vis_pol)
+    assert not np.allclose(vis[..., 0], vis[..., 1])
+
+    # Analytic beams are the same for all polarizations.
+    obs.set_beam("gaussian", gauss_width=20)
+    vis, _, _ = obs.make_visibilities(sky, beam_pol=["xx", "yy"])
+    assert np.all(vis[..., 0] == vis[..., 1])
+    pytest.raises(ValueError, obs.make_visibilities, sky, beam_pol=[])
+
+
+def test_max_memory():
+    obs, sky = _engine_setup(Nskies=3, Nfreqs=6, Ntimes=3)
+    vis0, times0, bls0 = obs.make_visibilities(sky, beam_pol=["xx", "yy"])
+    obs.make_visibilities(sky, max_memory=1e9)
+    # Budgets for several channels, for one channel, and for one channel and sky.
+    full = obs._chunk_bytes(6, 3)
+    for budget in [full / 2, obs._chunk_bytes(1, 2), obs._chunk_bytes(1, 1)]:
+        chunks = obs._chunk_sizes(budget, 3)
+        assert obs._chunk_bytes(*chunks[:2]) <= budget
+        assert chunks[:2] != (6, 3)
+        for engine, block in [("direct", 1), ("real", 2), ("antenna", 1), ("gemm", 1)]:
+            vis1, times1, bls1 = obs.make_visibilities(
+                sky,
+                beam_pol=["xx", "yy"],
+                engine=engine,
+                time_block=block,
+                max_memory=budget if engine != "gemm" else budget * 4 / 3,
+            )
+            assert np.all(times0 == times1) and np.all(bls0 == bls1)
+            assert np.allclose(vis0, vis1)
+    assert obs._chunk_sizes(full, 3)[:2] == (6, 3)
+    with pytest.warns(UserWarning, match="Memory budget"):
+        obs._chunk_sizes(1, 3)
+    pytest.raises(ValueError, obs.make_visibilities, sky, max_memory=0)
+
+
+def test_pixel_block():
+    obs, sky = _engine_setup(Nfreqs=6)
+    for engine in ["direct", "real"]:
+        vis0, times0, bls0 = obs.make_visibilities(sky, engine=engine)
+        for block in [7, "auto"]:
+            vis1, times1, bls1 = obs.make_visibilities(sky, engine=engine, pixel_block=block)
+            assert np.all(times0 == times1) and np.all(bls0 == bls1)
+            assert np.allclose(vis0, vis1)
+    assert obs._pixel_block_size(1, cache_bytes=0) == 256
+    pytest.raises(ValueError, obs.make_visibilities, sky, pixel_block=0)
+    pytest.raises(ValueError, obs.make_visibilities, sky, engine="gemm", pixel_block=64)
+    pytest.raises(ValueError, obs.make_visibilities, sky, time_block=2, pixel_block=64)
+
+
+def test_topocentric_engine():
+    # Short baselines and a smooth sky, which the resampling onto the kernel grid preserves.
+    ants = np.random.RandomState(0).uniform(-4, 4, (5, 3))
+    ants[:, 2] = 0.0
+    obs, sky = _engine_setup(Nside=32, Nfreqs=6, Ntimes=3, ants=ants)
+    vecs = np.array(hp.pix2vec(sky.Nside, np.arange(sky.Npix))).T
+    sky.data = np.ones((2, 1, 6)) * (1 + 0.5 * vecs[:, 0] + 0.3 * vecs[:, 2])[:, np.newaxis]
+    vis0, times0, bls0 = obs.make_visibilities(sky)
+    vis1, times1, bls1 = obs.make_visibilities(sky, engine="topocentric")
+    assert np.all(times0 == times1) and np.all(bls0 == bls1)
+    assert np.max(np.abs(vis1 - vis0)) < 2e-3 * np.max(np.abs(vis0))
+    # Chunked channels use the matching channels of the kernel, and the kernel
+    # is split into blocks of baselines that fit the budget.
+    assert obs._kernel_bytes(len(obs.array), ["xx", "yy"]) > 1e5
+    vis2, times2, bls2 = obs.make_visibilities(
+        sky, engine="topocentric", beam_pol=["xx", "yy"], max_memory=1e5
+    )
+    assert np.all(bls2 == bls1)
+    assert np.allclose(vis2[..., 1], vis1)
+
+    obs.set_beam([obs.beam] * 5)
+    pytest.raises(ValueError, obs.make_visibilities, sky, engine="topocentric")
+
+
+def test_ringroll_engine():
+    ants = np.random.RandomState(0).uniform(-4, 4, (5, 3))
+    ants[:, 2] = 0.0
+    obs, sky = _engine_setup(Nside=32, Nfreqs=6, ants=ants)
+    t0 = Time("J2000").jd
+    obs.set_pointings(t0 + np.arange(4) * utils.ringroll_cadence(sky.Nside, 3) / 86400.0)
+    vecs = np.array(hp.pix2vec(sky.Nside, np.arange(sky.Npix))).T
+    sky.data = np.ones((2, 1, 6)) * (1 + 0.5 * vecs[:, 0] + 0.3 * vecs[:, 2])[:, np.newaxis]
+    vis0, times0, bls0 = obs.make_visibilities(sky)
+    vis1, times1, bls1 = obs.make_visibilities(sky, engine="ringroll")
+    assert np.all(times0 == times1) and np.all(bls0 == bls1)
+    assert np.max(np.abs(vis1 - vis0)) < 1e-3 * np.max(np.abs(vis0))
+
+    # Pointings must be a whole number of equatorial pixels apart.
+    obs.set_pointings(t0 + np.arange(4) * 100 / 86400.0)
+    with pytest.raises(ValueError, match="time cadence"):
+        obs.make_visibilities(sky, engine="ringroll")
+
+
+def test_mmode_engine():
+    # On the equator the field of view is on equatorial rings, where rotations by
+    # whole pixels are exact, and the m-mode engine matches the direct engine.
+    obs, sky = _engine_setup(Nfreqs=3, fov=60)
+    bls = obs.array
+    obs = observatory.Observatory(0.0, longitude, array=bls, freqs=obs.freqs, fov=60)
+    obs.set_beam("gaussian", gauss_width=20)
+    obs.set_pointings(np.array([Time("J2000").jd]))
+    step = 360.0 / (4 * sky.Nside)
+    center, north = obs.pointing_centers[0], obs.north_poles[0]
+    obs.pointing_centers = [[center[0] + 3 * k * step, center[1]] for k in range(4)]
+    obs.north_poles = [[north[0] + 3 * k * step, north[1]] for k in range(4)]
+    obs.times_jd = np.arange(4.0)
+    vis0, times0, bls0 = obs.make_visibilities(sky, beam_pol=["xx", "yy"])
+    vis1, times1, bls1 = obs.make_visibilities(sky, beam_pol=["xx", "yy"], engine="mmode")
+    assert np.all(times0 == times1) and np.all(bls0 == bls1)
+    assert np.allclose(vis0, vis1)
+
+
+def test_uvgrid_engine():
+    layout = _hex37_layout()
+    obs, sky = _engine_setup(ants=layout, Nskies=2, Ntimes=1)
+    vis0, times0, bls0 = obs.make_visibilities(sky)
+    for accuracy in [1e-3, 1e-6]:
+        vis1, times1, bls1 = obs.make_visibilities(sky, engine="uvgrid", accuracy=accuracy)
+        assert np.all(times0 == times1) and np.all(bls0 == bls1)
+        assert np.max(np.abs(vis1 - vis0)) < accuracy * np.max(np.abs(vis0))
+
+    # Non-coplanar antennas are gridded in w.
+    layout[:, 2] = np.random.RandomState(0).uniform(-1, 1, len(layout))
+    obs, sky = _engine_setup(ants=layout[:8], Nskies=1, Ntimes=1)
+    vis0 = obs.make_visibilities(sky)[0]
+    vis1 = obs.make_visibilities(sky, engine="uvgrid", accuracy=1e-4)[0]
+    assert np.max(np.abs(vis1 - vis0)) < 1e-4 * np.max(np.abs(vis0))
+
+    pytest.raises(ValueError, obs.make_visibilities, sky, engine="uvgrid", accuracy=0)
+
+
+def test_delay_engine():
+    layout = _hex37_layout()
+    obs, sky = _engine_setup(ants=layout[:7], Nfreqs=32, Ntimes=1)
+    # Smooth power-law spectra.
+    amp = np.random.RandomState(0).lognormal(size=(2, sky.Npix, 1))
+    sky.data = amp * (sky.freqs / 110e6) ** -2.5
+    vis0, times0, bls0 = obs.make_visibilities(sky)
+    for kernel in ["kaiser_bessel", "gaussian"]:
+        vis1, times1, bls1 = obs.make_visibilities(sky, engine="delay", nufft_kernel=kernel)
+        assert np.all(times0 == times1) and np.all(bls0 == bls1)
+        assert np.max(np.abs(vis1 - vis0)) < 1e-6 * np.max(np.abs(vis0))
+
+    # Noise-like spectra are summed directly.
+    sky.make_flat_spectrum_shell(1.0)
+    vis0 = obs.make_visibilities(sky)[0]
+    assert np.allclose(obs.make_visibilities(sky, engine="delay")[0], vis0)
+
+    pytest.raises(ValueError, obs.make_visibilities, sky, engine="delay", nufft_kernel="sinc")
+
+
+def test_time_sampling():
+    layout = _hex37_layout()
+    obs, sky = _engine_setup(ants=layout[:7], Nskies=1, fov=90)
+    obs.set_beam("gaussian", gauss_width=10)
+    times = Time("J2000").jd + np.arange(60) * 11 / 86400.0
+    # Short baselines are sampled more coarsely than long ones.
+    obs.set_pointings(times)
+    rate = obs._max_fringe_rate()
+    lengths = np.array([np.linalg.norm(bl.enu) for bl in obs.array])
+    assert rate[np.argmin(lengths)] < rate[np.argmax(lengths)]
+
+    vis0, times0, bls0 = obs.make_visibilities(sky)
+    vis1, times1, bls1 = obs.make_visibilities(sky, time_accuracy=1e-3)
+    assert np.all(times0 == times1) and np.all(bls0 == bls1)
+    assert np.max(np.abs(vis1 - vis0)) < 1e-3 * np.max(np.abs(vis0))
+
+    obs.set_pointings(times[[0, 1, 3]])
+    pytest.raises(ValueError, obs.make_visibilities, sky, time_accuracy=1e-3)
+
+
+def test_coarse_engine():
+    layout = _hex37_layout()
+    obs, sky = _engine_setup(ants=layout[:7], Nfreqs=128, Ntimes=1)
+    amp = np.random.RandomState(0).lognormal(size=(2, sky.Npix, 1))
+    sky.data = amp * (sky.freqs / 110e6) ** -2.5
+    vis0, times0, bls0 = obs.make_visibilities(sky)
+    vis1, times1, bls1 = obs.make_visibilities(sky, engine="coarse")
+    assert np.all(times0 == times1) and np.all(bls0 == bls1)
+    assert np.max(np.abs(vis1 - vis0)) < 1e-6 * np.max(np.abs(vis0))
+    # The short baselines are evaluated on a fraction of the channels.
+    chans, interp = obs._coarse_channels(20)
+    assert chans.size == 30 and np.all(np.diff(chans) > 0)
+
+    # Long baselines need every channel.
+    obs, sky = _engine_setup(ants=np.array([[0.0, 0, 0], [6e4, 0, 0]]), Nfreqs=128, Ntimes=1)
+    sky.data = amp * (sky.freqs / 110e6) ** -2.5
+    vis0 = obs.make_visibilities(sky)[0]
+    vis1 = obs.make_visibilities(sky, engine="coarse")[0]
+    assert np.max(np.abs(vis1 - vis0)) < 1e-6 * np.max(np.abs(vis0))
+
+    # Noise-like skies are rejected.
+    sky.make_flat_spectrum_shell(1.0)
+    with pytest.warns(UserWarning, match="not smooth"):
+        vis1 = obs.make_visibilities(sky, engine="coarse")[0]
+    assert np.allclose(vis1, obs.make_visibilities(sky)[0])
+
+
+def test_multires():
+    layout = _hex37_layout()
+    obs, sky = _engine_setup(ants=layout[:7], Nside=64, Nskies=1, fov=90, Ntimes=1)
+    obs.set_beam("gaussian", gauss_width=30)
+    vecs = np.array(hp.pix2vec(64, np.arange(sky.Npix))).T
+    sky.data = np.repeat((2 + 0.3 * vecs[:, :1]) ** 2, 4, axis=1)[None]
+    # Short baselines are summed over a degraded sky.
+    nsides = obs._resolution_nsides(64, 1e-1)
+    assert np.min(nsides) < 64
+
+    # The accuracy is relative to the beam-weighted flux.
+    flux = _zero_spacing_flux(obs, sky)
+    vis0, times0, bls0 = obs.make_visibilities(sky)
+    vis1, times1, bls1 = obs.make_visibilities(sky, sky_accuracy=1e-1)
+    assert np.all(times0 == times1) and np.all(bls0 == bls1)
+    assert np.max(np.abs(vis1 - vis0)) < 1e-1 * flux
+    assert all(err < 1e-1 for err in obs.resolution_error.values())
+    pytest.raises(ValueError, obs.make_visibilities, sky, engine="ringroll", sky_accuracy=1e-1)
+
+
+def test_merge_pixels():
+    layout = _hex37_layout()
+    obs, sky = _engine_setup(ants=layout[:7], Nside=32, Nskies=1, fov=180, Ntimes=1)
+    obs.set_beam("gaussian", gauss_width=10)
+    flux = _zero_spacing_flux(obs, sky)
+    vis0, times0, bls0 = obs.make_visibilities(sky)
+    vis1, times1, bls1 = obs.make_visibilities(sky, merge_accuracy=1e-3)
+    assert np.all(times0 == times1) and np.all(bls0 == bls1)
+    assert np.max(np.abs(vis1 - vis0)) < 1e-3 * flux
+    assert obs.merge_error < 1e-3
+    # Baselines may be given as an array.
+    obs.array = np.array(obs.array, dtype=object)
+    vis2 = obs.make_visibilities(sky, merge_accuracy=1e-3, cull_accuracy=1e-3)[0]
+    assert np.max(np.abs(vis2 - vis0)) < 2e-3 * flux
+
+    # The sidelobes are merged into fewer pixels.
+    center, north = obs.pointing_centers[0], obs.north_poles[0]
+    za, az, pix = obs.calc_azza(center, north, return_inds=True)
+    beam = obs._pol_beam_val(az, za, ["pI"], np.empty((1, pix.size, obs.Nfreqs)))
+    srt, starts = obs._merge_groups(pix, beam)
+    assert starts.size < pix.size / 2
+    pytest.raises(ValueError, obs.make_visibilities, sky, engine="gemm", merge_accuracy=1e-3)
+
+
+def test_cull_pixels():
+    obs, sky = _engine_setup(Nside=32, Nskies=1, fov=180, Ntimes=2)
+    obs.set_beam("gaussian", gauss_width=7.37)
+    # Noise-like and flat skies both stay within the budget.
+    for data in [sky.data.copy(), np.ones_like(sky.data)]:
+        sky.data = data
+        flux = _zero_spacing_flux(obs, sky)
+        vis0, times0, bls0 = obs.make_visibilities(sky)
+        vis1, times1, bls1 = obs.make_visibilities(sky, cull_accuracy=1e-4)
+        assert np.all(times0 == times1) and np.all(bls0 == bls1)
+        assert np.max(np.abs(vis1 - vis0)) < 1e-4 * flux
+        assert obs.cull_error < 1e-4
+
+    # Narrow beams keep a fraction of a wide field of view.
+    pix, beam, wsky = obs._first_fov(sky.data)
+    assert obs._cull_pixels(wsky).size < pix.size / 4
+    pytest.raises(ValueError, obs.make_visibilities, sky, time_block=2, cull_accuracy=1e-4)
+
+
+def test_empty_fov():
+    # A field of view narrower than a pixel selects none, and gives zero visibilities.
+    obs, sky = _engine_setup(Nside=8, fov=0.5)
+    t0 = Time("J2000").jd
+    obs.set_pointings(t0 + np.arange(2) * utils.ringroll_cadence(sky.Nside) / 86400.0)
+    engines = ["gemm", "topocentric", "ringroll", "mmode", "uvgrid", "delay"]
+    options = [dict(time_block=2), dict(merge_accuracy=1e-3), dict(cull_accuracy=1e-3)]
+    options.append(dict(merge_accuracy=1e-3, cull_accuracy=1e-3))
+    for kwargs in [dict(engine=e) for e in engines] + options:
+        vis = obs.make_visibilities(sky, **kwargs)[0]
+        assert vis.shape == (len(obs.array) * obs.Ntimes, sky.Nskies, obs.Nfreqs)
+        assert np.all(vis == 0)
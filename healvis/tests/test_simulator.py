@@ -426,3 +426,12 @@ def test_freq_time_params():
     ttest = simulator.parse_time_params(time_dict)
     assert np.allclose(ftest["freq_array"], freqs)
     assert np.allclose(ttest["time_array"], times)
+
+
+def test_visibility_options():
+    param_dict = yaml.safe_load("engine: real\nmax_memory: 4e9\nredundancy: 1e-3\nNprocs: 2\n")
+    opts = simulator._visibility_options(param_dict)
+    assert opts["engine"] == "real" and opts["fringe"] == "direct"
+    assert opts["max_memory"] == 4e9 and opts["redundancy"] == 1e-3
+    assert opts["time_accuracy"] is None
+    assert param_dict == {"Nprocs": 2}
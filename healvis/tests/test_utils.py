@@ -7,6 +7,8 @@ import multiprocessing as mp
 import time
 import pytest
 
+from astropy_healpix import healpy as hp
+
 from healvis import utils
 
 
@@ -62,3 +64,59 @@ def assert_raises_message(exception_type, message, func, *args, **kwargs):
     except AssertionError as excp:
         print("{} not in {}".format(message, str(err.value)))
         raise excp
+
+
+def test_ring_disc_pixels():
+    nside = 8
+    start, npix, theta, phi0 = utils.ring_table(nside)
+    th, ph = hp.pix2ang(nside, start)
+    assert np.allclose(th, theta) and np.allclose(ph, phi0)
+    assert np.sum(npix) == 12 * nside ** 2
+
+    vecs = np.array(hp.pix2vec(nside, np.arange(12 * nside ** 2))).T
+    np.random.seed(3)
+    centers = np.vstack((np.random.normal(size=(20, 3)), [[0, 0, 1], [0, 0, -1]]))
+    for vec in centers / np.linalg.norm(centers, axis=1)[:, np.newaxis]:
+        for radius in [0.01, 0.2, np.pi / 2, 3.0]:
+            pix = utils.ring_disc_pixels(nside, vec, radius)
+            inside = np.flatnonzero(np.dot(vecs, vec) >= np.cos(radius))
+            assert np.all(np.isin(inside, pix))
+            assert np.unique(pix).size == pix.size
+            assert pix.size <= inside.size + 5 * (4 * nside - 1)
+
+
+def test_pixel_runs():
+    pix = np.array([2, 3, 4, 7, 9, 10])
+    starts, stops = utils.pixel_runs(pix)
+    assert np.all(starts == [2, 7, 9]) and np.all(stops == [5, 8, 11])
+    assert np.all(np.concatenate([np.arange(a, b) for a, b in zip(starts, stops)]) == pix)
+    assert utils.pixel_runs(np.array([], dtype=int))[0].size == 0
+
+
+def test_nufft_plan():
+    rng = np.random.RandomState(0)
+    x = rng.uniform(-np.pi, np.pi, (200, 2))
+    coeffs = rng.normal(size=(200, 3)) + 1j * rng.normal(size=(200, 3))
+    k = np.arange(-8, 8)
+    phase = k[:, None, None] * x[:, 0] + k[None, :, None] * x[:, 1]
+    ref = np.einsum("abp,pc->abc", np.exp(1j * phase), coeffs)
+    for kernel in ["gaussian", "kaiser_bessel"]:
+        modes = utils.NUFFTPlan(x, 16, eps=1e-8, kernel=kernel).execute(coeffs)
+        assert np.max(np.abs(modes - ref)) < 1e-8 * np.max(np.abs(ref))
+    pytest.raises(ValueError, utils.NUFFTPlan, x, 16, kernel="sinc")
+    # No points give zero modes.
+    modes = utils.NUFFTPlan(np.zeros((0, 2)), 16).execute(np.zeros((0, 3)))
+    assert modes.shape == (16, 16, 3) and np.all(modes == 0)
+
+
+def test_ud_grade():
+    nside = 16
+    data = np.random.RandomState(0).normal(size=(2, 12 * nside ** 2, 3))
+    low = utils.ud_grade(data, 4)
+    assert low.shape == (2, 12 * 4 ** 2, 3)
+    assert np.allclose(np.sum(low, axis=1) * 16, np.sum(data, axis=1))
+    # Each pixel is the mean of the pixels whose centers it contains.
+    pix = hp.ang2pix(4, *hp.pix2ang(nside, np.arange(12 * nside ** 2)))
+    assert np.allclose(low[0, 5, 0], np.mean(data[0, pix == 5, 0]))
+    pytest.raises(ValueError, utils.ud_grade, data, 32)
+    pytest.raises(ValueError, utils.ud_grade, data[:, :-1], 4)
@@ -5,6 +5,7 @@
 import numpy as np
 import multiprocessing as mp
 from astropy.constants import c
+from astropy_healpix import healpy as hp
 
 
 def freq_array_to_params(freq_array):
@@ -113,3 +114,252 @@ def npix2nside(npix):
     if not test == np.floor(test):
         raise ValueError(f"Invalid number of pixels {npix}")
     return int(test)
+
+
+def ud_grade(data, nside_out, axis=-2):
+    """
+    Degrade RING-ordered HEALPix maps to a lower Nside by averaging.
+
+    Each output pixel is the mean of the input pixels it contains, so sums over
+    pixels times the pixel area are preserved.
+
+    Args:
+        data : ndarray, maps with the pixel axis given by axis
+        nside_out : int, Nside of the output, a power of two no larger than the input Nside
+        axis : int, pixel axis of data
+
+    Returns:
+        ndarray, the shape of data with 12 * nside_out ** 2 pixels along axis
+    """
+    data = np.moveaxis(np.asarray(data), axis, 0)
+    nside_in = hp.npix2nside(data.shape[0])
+    if nside_out > nside_in or nside_in % nside_out != 0:
+        raise ValueError(
+            "Cannot degrade Nside {} to Nside {}.".format(nside_in, nside_out)
+        )
+    ratio = (nside_in // nside_out) ** 2
+    nest = data[hp.nest2ring(nside_in, np.arange(data.shape[0]))]
+    low = nest.reshape((-1, ratio) + data.shape[1:]).mean(axis=1)
+    low = low[hp.ring2nest(nside_out, np.arange(low.shape[0]))]
+    return np.moveaxis(low, 0, axis)
+
+
+def ring_table(nside):
+    """
+    Layout of the rings of a RING-ordered HEALPix map.
+
+    Args:
+        nside : HEALPix nside
+
+    Returns:
+        start : (ndarray of int, shape = (4 * nside - 1,)) index of the first pixel of each ring
+        npix : (ndarray of int) number of pixels in each ring
+        theta : (ndarray of float) colatitude of each ring [radians]
+        phi0 : (ndarray of float) longitude of the first pixel of each ring [radians]
+    """
+    ring = np.arange(1, 4 * nside)
+    # Distance from the nearer pole, in rings.
+    polar = np.minimum(ring, 4 * nside - ring)
+    npix = 4 * np.minimum(polar, nside)
+    start = np.concatenate(([0], np.cumsum(npix)[:-1]))
+    z = np.where(
+        polar < nside,
+        1 - polar ** 2 / (3.0 * nside ** 2),
+        (4.0 / 3) - 2.0 * np.minimum(ring, 4 * nside - ring) / (3.0 * nside),
+    )
+    z = np.where(ring > 2 * nside, -z, z)
+    theta = np.arccos(z)
+    # Pixels are offset by half a pixel, except on every other equatorial ring.
+    shifted = (polar < nside) | ((ring - nside) % 2 == 0)
+    phi0 = np.where(shifted, np.pi / npix, 0.0)
+
+    return start, npix, theta, phi0
+
+
+def ring_disc_pixels(nside, vec, radius, table=None):
+    """
+    Indices of the RING-ordered HEALPix pixels whose centers may lie within radius of vec.
+
+    Only the rings that cross the disc are visited, and on each ring only the range of
+    longitudes inside the disc. The ranges are widened by one pixel so the result
+    contains every pixel center within the disc, plus a few just outside.
+
+    Args:
+        nside : HEALPix nside
+        vec : (array_like, shape = (3,)) unit vector to the disc center
+        radius : radius of the disc [radians]
+        table : output of ring_table(nside), to avoid recomputing it
+
+    Returns:
+        ndarray of int, sorted pixel indices.
+    """
+    start, npix, theta, phi0 = ring_table(nside) if table is None else table
+    if radius >= np.pi:
+        return np.arange(12 * nside ** 2)
+    theta_c = np.arccos(np.clip(vec[2], -1, 1))
+    phi_c = np.arctan2(vec[1], vec[0])
+    dtheta = np.pi / (4 * nside)  # Upper bound on the spacing of rings
+    rings = np.flatnonzero(np.abs(theta - theta_c) <= radius + dtheta)
+    sin_prod = np.sin(theta[rings]) * np.sin(theta_c)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cos_dphi = (np.cos(radius) - np.cos(theta[rings]) * np.cos(theta_c)) / sin_prod
+    dphi = np.arccos(np.clip(np.nan_to_num(cos_dphi, nan=-1.0), -1, 1))
+    n = npix[rings]
+    step = 2 * np.pi / n
+    j0 = np.floor((phi_c - dphi - phi0[rings]) / step).astype(int) - 1
+    j1 = np.ceil((phi_c + dphi - phi0[rings]) / step).astype(int) + 1
+    full = (j1 - j0 + 1 >= n) | (sin_prod == 0)
+    j0 = np.where(full, 0, j0)
+    length = np.where(full, n, j1 - j0 + 1)
+    # Pixels j0, ..., j0 + length - 1 of each ring, wrapped around the ring.
+    offsets = np.concatenate(([0], np.cumsum(length)[:-1]))
+    j = np.arange(length.sum()) - np.repeat(offsets - j0, length)
+    pix = np.repeat(start[rings], length) + j % np.repeat(n, length)
+
+    return np.sort(pix)
+
+
+def pixel_runs(pix):
+    """
+    Runs of consecutive indices in a sorted array of pixel indices.
+
+    In RING ordering the pixels of a field of view are a few runs per ring, so the
+    pixels can be read from a map as slices.
+
+    Args:
+        pix : (ndarray of int) sorted pixel indices
+
+    Returns:
+        starts, stops : (ndarray of int) first and one past the last pixel of each run
+    """
+    pix = np.asarray(pix)
+    if pix.size == 0:
+        return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+    breaks = np.flatnonzero(np.diff(pix) != 1) + 1
+    starts = pix[np.concatenate(([0], breaks))]
+    stops = pix[np.concatenate((breaks - 1, [pix.size - 1]))] + 1
+
+    return starts, stops
+
+
+def ringroll_cadence(nside, shift=1):
+    """
+    Time cadence that rotates the sky by a whole number of equatorial HEALPix pixels.
+
+    The equatorial rings have 4 * nside pixels, so the sky turns by one pixel
+    every sidereal day / (4 * nside). The sidereal day here is the rotation period
+    of the Earth relative to the ICRS (the stellar day).
+
+    Args:
+        nside : HEALPix nside
+        shift : number of equatorial pixels per time step
+
+    Returns:
+        Time cadence [seconds]
+    """
+    sidereal_day = 86164.0989  # seconds
+    return shift * sidereal_day / (4 * nside)
+
+
+class NUFFTPlan(object):
+    """
+    Type-1 non-uniform FFT of a fixed set of points, by spreading onto an oversampled grid.
+
+    Computes f_k = sum_p c_p exp(i k . x_p) for the modes k = -M // 2, ..., M - M // 2 - 1
+    on each axis, for points x_p in [-pi, pi). The spreading matrix depends only on the
+    points, so it is built once and applied to any number of coefficient vectors.
+
+    Args:
+        x : (ndarray, shape = (Npts,) or (Npts, ndim)) positions of the points
+        M : number of modes on each axis
+        eps : requested relative accuracy
+        kernel : "gaussian" (Greengard & Lee 2004) or "kaiser_bessel" spreading kernel
+        oversamp : oversampling factor of the spreading grid
+    """
+
+    def __init__(self, x, M, eps=1e-6, kernel="gaussian", oversamp=2):
+        from scipy import sparse
+
+        if kernel not in ["gaussian", "kaiser_bessel"]:
+            raise ValueError("Unknown NUFFT kernel: {}".format(kernel))
+        x = np.asarray(x, dtype=float)
+        if x.ndim == 1:
+            x = x[:, np.newaxis]
+        Npts, ndim = x.shape
+        self.M, self.ndim, self.kernel = M, ndim, kernel
+        self.Mr = Mr = int(oversamp * M)
+        # Half-width of the kernel, in grid points.
+        digits = max(1, int(np.ceil(-np.log10(eps))))
+        if kernel == "gaussian":
+            self.width = width = digits + 1
+            self.tau = np.pi * width / (M ** 2 * oversamp * (oversamp - 0.5))
+        else:
+            self.width = width = digits // 2 + 2
+            self.beta = np.pi * np.sqrt(
+                (2 * width / oversamp) ** 2 * (oversamp - 0.5) ** 2 - 0.8
+            )
+
+        # Grid index and weight of each point on each axis, shape (Npts, ndim, 2 * width)
+        h = 2 * np.pi / Mr
+        offsets = np.arange(-width + 1, width + 1)
+        inds = np.floor(x / h).astype(int)[..., np.newaxis] + offsets
+        weights = self._kernel(x[..., np.newaxis] - inds * h)
+        inds %= Mr
+        # Tensor product over the axes. Sizes are explicit, since Npts may be 0.
+        flat = np.zeros((Npts, 1), dtype=int)
+        wts = np.ones((Npts, 1))
+        for d in range(ndim):
+            shape = (Npts, (2 * width) ** (d + 1))
+            flat = (flat[:, :, np.newaxis] * Mr + inds[:, d, np.newaxis, :]).reshape(shape)
+            wts = (wts[:, :, np.newaxis] * weights[:, d, np.newaxis, :]).reshape(shape)
+        cols = np.repeat(np.arange(Npts), flat.shape[1])
+        self.spread = sparse.csr_matrix(
+            (wts.ravel(), (flat.ravel(), cols)), shape=(Mr ** ndim, Npts)
+        )
+        # Modes and deconvolution of the kernel on each axis.
+        self.modes = np.arange(-(M // 2), M - M // 2)
+        self.deconv = 1 / self._kernel_ft(self.modes)
+
+    def _kernel(self, dx):
+        """
+        Spreading kernel at offsets dx [radians] from the points.
+        """
+        if self.kernel == "gaussian":
+            return np.exp(-(dx ** 2) / (4 * self.tau))
+        from scipy.special import i0
+
+        z = dx * self.Mr / (2 * np.pi * self.width)  # In units of the half-width
+        arg = np.sqrt(np.clip(1 - z ** 2, 0, None))
+        return np.where(np.abs(z) <= 1, i0(self.beta * arg), 0.0)
+
+    def _kernel_ft(self, k):
+        """
+        Fourier series coefficient of the periodized kernel at mode k.
+        """
+        if self.kernel == "gaussian":
+            return np.sqrt(self.tau / np.pi) * np.exp(-(k ** 2) * self.tau)
+        a = 2 * np.pi * self.width / self.Mr  # Half-width [radians]
+        s = np.sqrt((self.beta ** 2 - (a * k) ** 2).astype(complex))
+        return (a / np.pi * np.sinh(s) / s).real
+
+    def execute(self, c):
+        """
+        Modes of the coefficients c, of shape (Npts, ...).
+
+        Returns:
+            ndarray of complex, shape (M,) * ndim + c.shape[1:]
+        """
+        c = np.asarray(c)
+        extra = c.shape[1:]
+        Ncols = int(np.prod(extra))
+        grid = self.spread.dot(c.reshape(c.shape[0], Ncols))
+        grid = grid.reshape((self.Mr,) * self.ndim + (Ncols,))
+        grid = np.fft.ifftn(grid, axes=tuple(range(self.ndim)))
+        sel = np.ix_(*[self.modes % self.Mr] * self.ndim)
+        f = grid[sel]
+        for d in range(self.ndim):
+            shape = [1] * f.ndim
+            shape[d] = self.M
+            f = f * self.deconv.reshape(shape)
+
+        return f.reshape((self.M,) * self.ndim + extra)